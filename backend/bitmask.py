@@ -0,0 +1,124 @@
+import sys
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend.schemas import AllergenEnum, DietaryConstraintEnum
+
+# Bit positions follow enum declaration order, so the enums are APPEND-ONLY.
+# Reordering or removing a member silently changes stored masks (re-run the backfill if you must).
+ALLERGEN_BITS: Dict[str, int] = {member.value: 1 << i for i, member in enumerate(AllergenEnum)}
+CONSTRAINT_BITS: Dict[str, int] = {member.value: 1 << i for i, member in enumerate(DietaryConstraintEnum)}
+
+def _encode(values: Optional[Iterable[str]], bits: Dict[str, int]) -> int:
+    mask = 0
+    for value in values or []:
+        mask |= bits.get(value, 0)
+    return mask
+
+def encode_allergens(allergens: Optional[Iterable[str]]) -> int:
+    """Known allergens -> bitmask. Free-text allergens outside AllergenEnum have no bit."""
+    return _encode(allergens, ALLERGEN_BITS)
+
+def encode_constraints(values: Optional[Iterable[str]]) -> int:
+    """Dietary constraints (user.constraints or dish.tags) -> bitmask. Other tags have no bit."""
+    return _encode(values, CONSTRAINT_BITS)
+
+def mask_or_none(values: Optional[Iterable[str]], bits: Dict[str, int]) -> Optional[int]:
+    """Stored mask for an array column: NULL array (unknown) -> NULL mask, never 0 ("none")."""
+    return None if values is None else _encode(values, bits)
+
+def all_known_allergens(allergens: Optional[Iterable[str]]) -> bool:
+    """True if every value has a bit, i.e. the bitmask check is exact for these allergens."""
+    return all(a in ALLERGEN_BITS for a in allergens or [])
+
+def all_known_constraints(constraints: Optional[Iterable[str]]) -> bool:
+    return all(c in CONSTRAINT_BITS for c in constraints or [])
+
+def mask_sql(array_ref: str, bits: Dict[str, int]) -> str:
+    """SQL expression computing the mask from a text[] column, e.g. for NEW.allergens (NULL stays NULL)."""
+    terms = [f"(CASE WHEN '{value}' = ANY({array_ref}) THEN {bit} ELSE 0 END)" for value, bit in bits.items()]
+    return f"(CASE WHEN {array_ref} IS NULL THEN NULL ELSE {' | '.join(terms) if terms else '0'} END)"
+
+# (table, array column, mask column, bits). Dishes only: user allergens / constraints are
+# encoded per request from the cached profile (backend.profiles), nothing reads a stored user mask.
+MASK_COLUMNS = [
+    ("dishes", "allergens", "allergen_mask", ALLERGEN_BITS),
+    ("dishes", "tags", "tag_mask", CONSTRAINT_BITS),
+]
+
+# Earlier releases also mirrored users.allergens_strict / users.constraints: dropped again
+RETIRED_MASK_COLUMNS = [("users", "allergen_mask"), ("users", "constraint_mask")]
+
+def schema_patches():
+    """
+    Idempotent DDL for backend.migrations:
+      - add each mask column, backfilling existing rows in the same step (only when added),
+      - a BEFORE INSERT/UPDATE trigger per table so raw SQL writers (the psycopg2 seeder)
+        keep masks in sync with the arrays too,
+      - NULL masks wherever the array is NULL (rows masked as 0 before that rule).
+    NULL allergens mean "unknown" (e.g. enrichment failed), not "none": the mask stays NULL,
+    and a NULL mask fails every safety predicate, never passes it (same rule as the array
+    fallback in backend.queries and the snapshot in backend.snapshot).
+    """
+    statements = []
+    for table, array_column, mask_column, bits in MASK_COLUMNS:
+        statements.append(f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = '{table}' AND column_name = '{mask_column}'
+    ) THEN
+        ALTER TABLE {table} ADD COLUMN {mask_column} BIGINT;
+        UPDATE {table} SET {mask_column} = {mask_sql(array_column, bits)};
+    END IF;
+END $$""")
+
+    for table in dict.fromkeys(t for t, _, _, _ in MASK_COLUMNS):
+        assignments = "\n".join(
+            f"    NEW.{mask_column} := {mask_sql('NEW.' + array_column, bits)};"
+            for t, array_column, mask_column, bits in MASK_COLUMNS if t == table
+        )
+        statements.append(f"""
+CREATE OR REPLACE FUNCTION {table}_sync_masks() RETURNS trigger AS $$
+BEGIN
+{assignments}
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql""")
+        statements.append(f"DROP TRIGGER IF EXISTS {table}_sync_masks ON {table}")
+        statements.append(
+            f"CREATE TRIGGER {table}_sync_masks BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {table}_sync_masks()"
+        )
+
+    for table, array_column, mask_column, _ in MASK_COLUMNS:
+        statements.append(
+            f"UPDATE {table} SET {mask_column} = NULL WHERE {array_column} IS NULL AND {mask_column} IS NOT NULL"
+        )
+
+    for table in dict.fromkeys(t for t, _ in RETIRED_MASK_COLUMNS):
+        statements.append(f"DROP TRIGGER IF EXISTS {table}_sync_masks ON {table}")
+        statements.append(f"DROP FUNCTION IF EXISTS {table}_sync_masks()")
+    for table, mask_column in RETIRED_MASK_COLUMNS:
+        statements.append(f"ALTER TABLE {table} DROP COLUMN IF EXISTS {mask_column}")
+    return statements
+
+def backfill(engine: Engine):
+    """Recomputes every mask from the arrays (e.g. after appending enum members)."""
+    with engine.begin() as connection:
+        for table, array_column, mask_column, bits in MASK_COLUMNS:
+            connection.execute(text(f"UPDATE {table} SET {mask_column} = {mask_sql(array_column, bits)}"))
+
+if __name__ == "__main__":
+    # Usage: python -m backend.bitmask backfill
+    from backend.database import engine
+
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        backfill(engine)
+        print("✅ Allergen / constraint masks backfilled")
+    else:
+        print("Usage: python -m backend.bitmask backfill")
+        sys.exit(1)
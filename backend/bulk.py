@@ -0,0 +1,142 @@
+import io
+import os
+import struct
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.indexes import EMBEDDING_INDEX_NAMES, RESTAURANT_INDEX_NAME, managed_index_ddl
+
+# Bulk Load Config
+BULK_BATCH_ROWS = int(os.getenv("BULK_BATCH_ROWS", "10000"))
+# Index builds after a large load are memory bound (HNSW especially)
+BULK_MAINTENANCE_WORK_MEM = os.getenv("BULK_MAINTENANCE_WORK_MEM", "1GB")
+BULK_MAINTENANCE_WORKERS = int(os.getenv("BULK_MAINTENANCE_WORKERS", "4"))
+
+# COPY BINARY: no text formatting / parsing of 768 floats per row (the dominant cost),
+# and ~3 KB per vector on the wire instead of ~15 KB as a text literal.
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_NULL = struct.pack(">i", -1)
+_VARCHAR_OID = 1043  # Array element type must match the column (ARRAY(String) -> varchar[])
+
+def _text(value) -> bytes:
+    return str(value).encode("utf-8")
+
+def _float8(value) -> bytes:
+    return struct.pack(">d", value)
+
+def _int4(value) -> bytes:
+    return struct.pack(">i", value)
+
+def _bool(value) -> bytes:
+    return b"\x01" if value else b"\x00"
+
+def _varchar_array(values) -> bytes:
+    items = [str(v).encode("utf-8") for v in values]
+    if not items:
+        return struct.pack(">iii", 0, 0, _VARCHAR_OID)
+    parts = [struct.pack(">iiiii", 1, 0, _VARCHAR_OID, len(items), 1)]
+    for item in items:
+        parts.append(struct.pack(">i", len(item)))
+        parts.append(item)
+    return b"".join(parts)
+
+def _vector(values) -> bytes:
+    """pgvector binary format: int16 dim, int16 unused, dim x float4 (big endian)."""
+    array = np.asarray(values, dtype=">f4")
+    return struct.pack(">hh", array.shape[0], 0) + array.tobytes()
+
+# Column order of the COPY, with the binary encoder for each column type
+DISH_COPY_COLUMNS: Tuple[Tuple[str, Callable[[Any], bytes]], ...] = (
+    ("id", _text),
+    ("restaurant_id", _text),
+    ("name", _text),
+    ("description", _text),
+    ("price", _float8),
+    ("ingredients", _varchar_array),
+    ("allergens", _varchar_array),
+    ("tags", _varchar_array),
+    ("calories", _int4),
+    ("spice_level", _int4),
+    ("is_available", _bool),
+    ("embedding", _vector),
+    ("embedding_provider", _text),
+    ("embedding_dim", _int4),
+    ("content_hash", _text),
+)
+_FIELD_COUNT = struct.pack(">h", len(DISH_COPY_COLUMNS))
+
+def _encode_row(row: Dict[str, Any]) -> bytes:
+    parts = [_FIELD_COUNT]
+    for column, encode in DISH_COPY_COLUMNS:
+        value = row.get(column)
+        if value is None:
+            parts.append(_NULL)
+        else:
+            data = encode(value)
+            parts.append(struct.pack(">i", len(data)))
+            parts.append(data)
+    return b"".join(parts)
+
+def copy_dishes(cursor, rows: Iterable[Dict[str, Any]], batch_rows: int = BULK_BATCH_ROWS,
+                table: str = "dishes") -> Tuple[int, Set[str]]:
+    """
+    Streams dish dicts (keys from DISH_COPY_COLUMNS, missing keys -> NULL) through
+    COPY ... FROM STDIN (FORMAT binary), `batch_rows` rows per COPY. Works on a psycopg2 cursor.
+    Returns (rows loaded, restaurant ids touched).
+    """
+    statement = f"COPY {table} ({', '.join(column for column, _ in DISH_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT binary)"
+    loaded = 0
+    restaurant_ids = set()
+    batch = []
+
+    def flush():
+        cursor.copy_expert(statement, io.BytesIO(b"".join([_COPY_HEADER, *batch, _COPY_TRAILER])))
+        batch.clear()
+
+    for row in rows:
+        batch.append(_encode_row(row))
+        restaurant_ids.add(row["restaurant_id"])
+        if len(batch) >= batch_rows:
+            loaded += len(batch)
+            flush()
+    if batch:
+        loaded += len(batch)
+        flush()
+    return loaded, restaurant_ids
+
+def bump_menu_versions(cursor, restaurant_ids: Iterable[str]):
+    # Raw SQL bypasses the ORM flush hook, so invalidate menu snapshots here
+    cursor.execute(
+        "UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = ANY(%s)",
+        (list(restaurant_ids),),
+    )
+
+def bulk_load_dishes(connection, rows: Iterable[Dict[str, Any]], batch_rows: Optional[int] = None,
+                     rebuild_indexes: bool = True) -> int:
+    """
+    Catalogue-scale load on a psycopg2 connection, in the caller's transaction:
+      1. drop the ANN / restaurant indexes (maintaining HNSW per row is the slow part),
+      2. COPY every row,
+      3. rebuild the indexes once over the full table (IVFFlat centroids also need the data),
+      4. bump menu_version for touched restaurants and ANALYZE.
+    The caller commits. Returns the number of rows loaded.
+    """
+    with connection.cursor() as cur:
+        if rebuild_indexes:
+            for name in [*EMBEDDING_INDEX_NAMES.values(), RESTAURANT_INDEX_NAME]:
+                cur.execute(f"DROP INDEX IF EXISTS {name}")
+
+        loaded, restaurant_ids = copy_dishes(cur, rows, batch_rows or BULK_BATCH_ROWS)
+
+        if rebuild_indexes:
+            cur.execute(f"SET LOCAL maintenance_work_mem = '{BULK_MAINTENANCE_WORK_MEM}'")
+            cur.execute(f"SET LOCAL max_parallel_maintenance_workers = {BULK_MAINTENANCE_WORKERS}")
+            for ddl in managed_index_ddl():
+                cur.execute(ddl)
+
+        if restaurant_ids:
+            bump_menu_versions(cur, restaurant_ids)
+        cur.execute("ANALYZE dishes")
+    return loaded
@@ -0,0 +1,116 @@
+import os
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bundle Config
+# How many of the top-ranked safe dishes the optimizer combines
+BUNDLE_CANDIDATES = int(os.getenv("BUNDLE_CANDIDATES", "30"))
+
+def _parse_caps(spec: str) -> Dict[int, float]:
+    """'1=25,2=50,3=100' -> {1: 25.0, 2: 50.0, 3: 100.0}"""
+    caps = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        level, _, cap = item.partition("=")
+        caps[int(level)] = float(cap)
+    return caps
+
+# Total bundle price per User.budget_setting (1: $, 2: $$, 3: $$$); levels not listed are uncapped
+BUDGET_PRICE_CAPS = _parse_caps(os.getenv("BUDGET_PRICE_CAPS", "1=25,2=50,3=100"))
+
+class Bundle(NamedTuple):
+    indices: Tuple[int, ...]  # positions in the candidate list, best score first
+    score: float
+    total_price: float
+
+def price_cap(budget_setting: Optional[int]) -> Optional[float]:
+    return BUDGET_PRICE_CAPS.get(budget_setting) if budget_setting is not None else None
+
+def scores_from_distances(distances: Sequence[Optional[float]]) -> np.ndarray:
+    """
+    Similarity per dish = -distance (lower distance is nearer for both VECTOR_DISTANCE
+    operators). Dishes without a comparable vector score below every ranked dish.
+    """
+    values = np.array([np.nan if d is None else d for d in distances], dtype=np.float64)
+    scores = -values
+    finite = np.isfinite(scores)
+    floor = scores[finite].min() - 1.0 if finite.any() else 0.0
+    scores[~finite] = floor
+    return scores
+
+def _best_single(scores: np.ndarray, prices: np.ndarray, budget: float, start: int) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    fits = np.flatnonzero(prices[start:] <= budget)
+    if fits.size == 0:
+        return None
+    i = start + fits[np.argmax(scores[start + fits])]
+    return float(scores[i]), (int(i),)
+
+def _best_pair(scores: np.ndarray, prices: np.ndarray, budget: float, start: int) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """Best j < k (both >= start) under the budget: one masked (m, m) matrix, no Python loop."""
+    s = scores[start:]
+    p = prices[start:]
+    m = s.size
+    if m < 2:
+        return None
+    totals = s[:, None] + s[None, :]
+    valid = (p[:, None] + p[None, :] <= budget) & np.triu(np.ones((m, m), dtype=bool), 1)
+    if not valid.any():
+        return None
+    flat = int(np.argmax(np.where(valid, totals, -np.inf)))
+    j, k = divmod(flat, m)
+    return float(totals[j, k]), (start + j, start + k)
+
+def _search(scores: np.ndarray, prices: np.ndarray, size: int, budget: float, start: int,
+            best_score: float) -> Optional[Tuple[float, Tuple[int, ...]]]:
+    """
+    Branch and bound over candidates sorted by score (descending): fix the next dish, solve
+    the rest recursively, with the last two dishes picked by _best_pair. A branch stops as
+    soon as its optimistic bound (the next `size` scores in order) can't beat the best found.
+    """
+    if size == 1:
+        return _best_single(scores, prices, budget, start)
+    if size == 2:
+        return _best_pair(scores, prices, budget, start)
+
+    best = None
+    for i in range(start, scores.size - size + 1):
+        if scores[i:i + size].sum() <= best_score:
+            break  # Sorted: every later first dish has an even lower bound
+        if prices[i] > budget:
+            continue
+        rest = _search(scores, prices, size - 1, budget - prices[i], i + 1, best_score - scores[i])
+        if rest is not None and scores[i] + rest[0] > best_score:
+            best_score = float(scores[i] + rest[0])
+            best = (best_score, (i, *rest[1]))
+    return best
+
+def best_bundle(scores: Sequence[float], prices: Sequence[float], size: int,
+                price_cap: Optional[float] = None, spice_levels: Optional[Sequence[int]] = None,
+                spice_cap: Optional[int] = None) -> Optional[Bundle]:
+    """
+    The `size` distinct candidates with the highest summed score whose total price fits
+    price_cap, using only dishes at or below spice_cap. None when no combination fits.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    allowed = np.ones(scores.size, dtype=bool)
+    if spice_cap is not None and spice_levels is not None:
+        allowed &= np.array([(level or 0) <= spice_cap for level in spice_levels], dtype=bool)
+
+    budget = np.inf if price_cap is None else float(price_cap)
+    allowed &= prices <= budget
+    # Prune dishes that can't fit even next to the size - 1 cheapest allowed ones (a lower
+    # bound on any partner set, so nothing feasible is dropped)
+    if size > 1 and np.isfinite(budget) and allowed.sum() >= size:
+        cheapest_rest = np.sort(prices[allowed])[:size - 1].sum()
+        allowed &= prices + cheapest_rest <= budget
+
+    candidates = np.flatnonzero(allowed)
+    if candidates.size < size or size <= 0:
+        return None
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    found = _search(scores[order], prices[order], size, budget, 0, -np.inf)
+    if found is None:
+        return None
+    indices = tuple(int(order[i]) for i in found[1])
+    return Bundle(indices, found[0], float(prices[list(indices)].sum()))
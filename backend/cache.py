@@ -0,0 +1,327 @@
+import hashlib
+import re
+import time
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import EmbeddingCacheEntry, ExplanationCacheEntry
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """'  Something   SPICY ' and 'something spicy' must hit the same cache entry."""
+    return _WHITESPACE.sub(" ", text or "").strip().lower()
+
+def cache_key(*parts: str) -> str:
+    """Stable sha256 over the parts (fits a fixed-width primary key)."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """
+    In-process tier: bounded LRU with a TTL. Thread-safe because sync FastAPI
+    handlers run on a threadpool.
+    """
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class TwoTierCache:
+    """
+    In-process LRU in front of a Postgres table (`entry_model`, primary key `key`).
+    Subclasses build the key and map values to/from table columns.
+    Rows older than `persistent_ttl_seconds` (if set) are treated as misses and can be
+    removed with prune().
+    The persistent tier is reachable from sync code (session_factory) and, when
+    async_session_factory is given, from async handlers via the a* methods.
+    """
+    entry_model = None
+
+    def __init__(self, session_factory: Callable[[], Session], maxsize: int = 1024,
+                 ttl_seconds: float = 3600, persistent_ttl_seconds: Optional[float] = None,
+                 async_session_factory: Optional[Callable[[], AsyncSession]] = None):
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.memory = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.persistent_ttl_seconds = persistent_ttl_seconds
+        self.hits_memory = 0
+        self.hits_persistent = 0
+        self.misses = 0
+
+    def _entry_value(self, entry) -> Any:
+        raise NotImplementedError
+
+    def _is_expired(self, entry) -> bool:
+        if self.persistent_ttl_seconds is None or entry.created_at is None:
+            return False
+        return entry.created_at < datetime.utcnow() - timedelta(seconds=self.persistent_ttl_seconds)
+
+    def _from_memory(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits_memory += 1
+        return value
+
+    def _from_entry(self, key: str, entry) -> Optional[Any]:
+        value = None
+        if entry is not None and not self._is_expired(entry):
+            value = self._entry_value(entry)
+
+        if value is not None:
+            self.hits_persistent += 1
+            self.memory.set(key, value)
+            return value
+
+        self.misses += 1
+        return None
+
+    def _upsert(self, key: str, columns: Dict[str, Any]):
+        # Upsert so an expired row is refreshed rather than kept forever
+        columns["created_at"] = datetime.utcnow()
+        return (
+            insert(self.entry_model)
+            .values(key=key, **columns)
+            .on_conflict_do_update(index_elements=["key"], set_=columns)
+        )
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        # Tier 1: process memory
+        value = self._from_memory(key)
+        if value is not None:
+            return value
+
+        # Tier 2: Postgres
+        entry = None
+        try:
+            db = self.session_factory()
+            try:
+                entry = db.get(self.entry_model, key)
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"⚠️ {self.entry_model.__tablename__} read error: {e}")
+        return self._from_entry(key, entry)
+
+    def _store(self, key: str, value: Any, **columns):
+        self.memory.set(key, value)
+        try:
+            db = self.session_factory()
+            try:
+                db.execute(self._upsert(key, columns))
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"⚠️ {self.entry_model.__tablename__} write error: {e}")
+
+    async def _alookup(self, key: str) -> Optional[Any]:
+        value = self._from_memory(key)
+        if value is not None:
+            return value
+        if self.async_session_factory is None:
+            self.misses += 1
+            return None
+
+        entry = None
+        try:
+            async with self.async_session_factory() as db:
+                entry = await db.get(self.entry_model, key)
+        except Exception as e:
+            print(f"⚠️ {self.entry_model.__tablename__} read error: {e}")
+        return self._from_entry(key, entry)
+
+    async def _astore(self, key: str, value: Any, **columns):
+        self.memory.set(key, value)
+        if self.async_session_factory is None:
+            return
+        try:
+            async with self.async_session_factory() as db:
+                await db.execute(self._upsert(key, columns))
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️ {self.entry_model.__tablename__} write error: {e}")
+
+    def prune(self) -> int:
+        """Deletes persistent rows past their TTL. Returns the number removed."""
+        if self.persistent_ttl_seconds is None:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.persistent_ttl_seconds)
+        db = self.session_factory()
+        try:
+            removed = db.query(self.entry_model).filter(self.entry_model.created_at < cutoff).delete()
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.memory),
+            "hits_memory": self.hits_memory,
+            "hits_persistent": self.hits_persistent,
+            "misses": self.misses,
+        }
+
+class EmbeddingCache(TwoTierCache):
+    """
+    Two-tier cache for text embeddings, keyed on sha256(model, normalized text).
+    A hit in either tier skips the remote embedding call entirely.
+    """
+    entry_model = EmbeddingCacheEntry
+
+    def __init__(self, session_factory: Callable[[], Session], model: str, **kwargs):
+        super().__init__(session_factory, **kwargs)
+        self.model = model
+
+    def key_for(self, text: str) -> str:
+        return cache_key(self.model, normalize_text(text))
+
+    def _entry_value(self, entry: EmbeddingCacheEntry) -> List[float]:
+        return list(entry.embedding)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        return self._lookup(self.key_for(text))
+
+    def set(self, text: str, vector: List[float]):
+        vector = list(vector)
+        self._store(self.key_for(text), vector, model=self.model, text=normalize_text(text), embedding=vector)
+
+    async def aget(self, text: str) -> Optional[List[float]]:
+        return await self._alookup(self.key_for(text))
+
+    async def aset(self, text: str, vector: List[float]):
+        vector = list(vector)
+        await self._astore(self.key_for(text), vector, model=self.model, text=normalize_text(text), embedding=vector)
+
+def dish_content_version(name: str, description: Optional[str]) -> str:
+    """Changes whenever the inputs to the explanation prompt change."""
+    return cache_key(name or "", description or "")[:16]
+
+class ExplanationCache(TwoTierCache):
+    """
+    Two-tier cache for LLM explanations, keyed on
+    (model, dish id, dish content version, normalized user context).
+    Editing a dish's name/description yields a new version, so stale text is never served.
+    """
+    entry_model = ExplanationCacheEntry
+
+    def __init__(self, session_factory: Callable[[], Session], model: str, **kwargs):
+        super().__init__(session_factory, **kwargs)
+        self.model = model
+
+    def key_for(self, dish_id: str, dish_version: str, context: str) -> str:
+        return cache_key(self.model, dish_id, dish_version, normalize_text(context))
+
+    def _entry_value(self, entry: ExplanationCacheEntry) -> str:
+        return entry.explanation
+
+    def get(self, dish_id: str, dish_version: str, context: str) -> Optional[str]:
+        return self._lookup(self.key_for(dish_id, dish_version, context))
+
+    def _columns(self, dish_id: str, dish_version: str, context: str, explanation: str) -> Dict[str, str]:
+        return {
+            "dish_id": dish_id,
+            "dish_version": dish_version,
+            "context": normalize_text(context),
+            "explanation": explanation,
+        }
+
+    def set(self, dish_id: str, dish_version: str, context: str, explanation: str):
+        key = self.key_for(dish_id, dish_version, context)
+        self._store(key, explanation, **self._columns(dish_id, dish_version, context, explanation))
+
+    async def aget(self, dish_id: str, dish_version: str, context: str) -> Optional[str]:
+        return await self._alookup(self.key_for(dish_id, dish_version, context))
+
+    async def aset(self, dish_id: str, dish_version: str, context: str, explanation: str):
+        key = self.key_for(dish_id, dish_version, context)
+        await self._astore(key, explanation, **self._columns(dish_id, dish_version, context, explanation))
+
+class ResultCache:
+    """
+    In-process cache of serialized recommendation responses, keyed on
+    (user id, profile version, restaurant id, menu version, normalized mood) plus the
+    model parts that shape the answer. A profile or menu change yields a new key, so a
+    stale result is never served; superseded entries just age out of the LRU.
+    """
+    def __init__(self, *model_parts: str, maxsize: int = 4096, ttl_seconds: float = 600):
+        self.model_parts = model_parts
+        self.memory = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def key_for(self, user_id: str, profile_version: int, restaurant_id: str,
+                menu_version: Optional[int], mood: Optional[str]) -> str:
+        return cache_key(*self.model_parts, user_id, str(profile_version), restaurant_id,
+                         str(menu_version), normalize_text(mood or ""))
+
+    @staticmethod
+    def etag(key: str) -> str:
+        # Weak: explanations are equivalent, not byte-identical, across regenerations
+        return f'W/"{key[:32]}"'
+
+    def get(self, key: str) -> Optional[bytes]:
+        body = self.memory.get(key)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes):
+        self.memory.set(key, body)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check with weak comparison (RFC 9110): W/"x" matches "x"."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
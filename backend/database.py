@@ -0,0 +1,213 @@
+import os
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
+
+from backend.models import Base
+from backend.indexes import create_vector_indexes, detect_search_capabilities
+from backend.migrations import apply_schema_patches
+
+# Load env variables (scripts import this module directly, without backend.main)
+load_dotenv()
+
+# Database Setup
+DB_USER = os.getenv("POSTGRES_USER")
+DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+DB_HOST = os.getenv("POSTGRES_SERVER")
+DB_PORT = os.getenv("POSTGRES_PORT")
+DB_NAME = os.getenv("POSTGRES_DB")
+
+# MANAGE_SCHEMA=false: the API never runs DDL at startup (schema owned by a migration job /
+# one designated instance), so replicas and autoscaled workers boot without taking DDL locks.
+MANAGE_SCHEMA = os.getenv("MANAGE_SCHEMA", "true").lower() in ("1", "true", "yes")
+
+# Read replica (streaming replica of the primary, same credentials). Unset -> reads use the primary.
+DB_REPLICA_HOST = os.getenv("POSTGRES_REPLICA_SERVER")
+DB_REPLICA_PORT = os.getenv("POSTGRES_REPLICA_PORT", DB_PORT)
+
+# Pool Config (per engine, per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Replica pool defaults to the primary's size: it serves most of the traffic
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", str(DB_POOL_SIZE)))
+DB_REPLICA_MAX_OVERFLOW = int(os.getenv("DB_REPLICA_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+# Checkout waits kept per pool for the percentiles on /health
+POOL_WAIT_SAMPLES = 1024
+
+def _url(driver: str, host: str, port: str) -> str:
+    return f"{driver}://{DB_USER}:{DB_PASSWORD}@{host}:{port}/{DB_NAME}"
+
+SQLALCHEMY_DATABASE_URL = _url("postgresql", DB_HOST, DB_PORT)
+ASYNC_SQLALCHEMY_DATABASE_URL = _url("postgresql+asyncpg", DB_HOST, DB_PORT)
+
+class PoolWaitStats:
+    """Checkout counts and wait times (queueing + pre-ping) for one pool."""
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent = deque(maxlen=POOL_WAIT_SAMPLES)
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.recent.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self.recent)
+            checkouts, timeouts, total_wait, max_wait = self.checkouts, self.timeouts, self.total_wait, self.max_wait
+
+        def percentile(q):
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 3) if recent else 0.0
+
+        return {
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_ms_avg": round(total_wait / checkouts * 1000, 3) if checkouts else 0.0,
+            "wait_ms_p50": percentile(0.50),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": round(max_wait * 1000, 3),
+        }
+
+def _timed_pool_class(base, wait_stats: PoolWaitStats):
+    # Stats live on the class: dispose() recreates the pool via self.__class__, so they survive it
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = base.connect(self)
+        except exc.TimeoutError:
+            wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        wait_stats.record(time.perf_counter() - started)
+        return connection
+
+    return type(f"Timed{base.__name__}", (base,), {"connect": connect, "wait_stats": wait_stats})
+
+def _pool_options(base, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    return {
+        "poolclass": _timed_pool_class(base, PoolWaitStats()),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# Engines connect on first checkout, so building them here costs no round trip
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_options(QueuePool, DB_POOL_SIZE, DB_MAX_OVERFLOW))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for the request path (asyncpg), scripts keep using the sync one above
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, **_pool_options(AsyncAdaptedQueuePool, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+)
+# pgvector's SQLAlchemy type binds vectors as '[...]' text, which asyncpg passes through
+# in text format, so no binary codec is registered on the connections.
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+# Read path (recommendations / search): the replica when configured, else the primary's pool.
+# Either way transactions are READ ONLY, so a write sneaking into the read path fails loudly
+# in development instead of only once a replica is in front of it.
+if DB_REPLICA_HOST:
+    async_read_engine: AsyncEngine = create_async_engine(
+        _url("postgresql+asyncpg", DB_REPLICA_HOST, DB_REPLICA_PORT),
+        execution_options={"postgresql_readonly": True},
+        **_pool_options(AsyncAdaptedQueuePool, DB_REPLICA_POOL_SIZE, DB_REPLICA_MAX_OVERFLOW),
+    )
+else:
+    async_read_engine = async_engine.execution_options(postgresql_readonly=True)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False)
+
+def has_replica() -> bool:
+    return bool(DB_REPLICA_HOST)
+
+def pool_status(engine) -> Dict[str, Any]:
+    """Live pool counters + checkout wait stats for /health."""
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        "timeout_s": pool.timeout(),
+        "pre_ping": pool._pre_ping,
+    }
+    wait_stats: Optional[PoolWaitStats] = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        status.update(wait_stats.stats())
+    return status
+
+def database_status() -> Dict[str, Any]:
+    status = {
+        "primary": pool_status(async_engine.sync_engine),
+        "primary_sync": pool_status(engine),
+    }
+    if has_replica():
+        status["replica"] = pool_status(async_read_engine.sync_engine)
+    return status
+
+async def dispose_engines():
+    await async_engine.dispose()
+    if has_replica():
+        await async_read_engine.dispose()
+    engine.dispose()
+
+def env_ok() -> bool:
+    return all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME])
+
+def init_schema(engine: Engine = engine):
+    """Extension, tables, column patches and ANN indexes. Every step is idempotent."""
+    with engine.connect() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        connection.commit()
+        # Create Tables
+        Base.metadata.create_all(bind=engine)
+    apply_schema_patches(engine)
+    # ANN + restaurant scope indexes
+    create_vector_indexes(engine)
+
+def init_database(engine: Engine = engine, manage_schema: bool = None):
+    """Startup hook: full schema management, or only the capability probe the query path needs."""
+    if manage_schema if manage_schema is not None else MANAGE_SCHEMA:
+        init_schema(engine)
+    else:
+        detect_search_capabilities(engine)
+
+# Dependency
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Primary session: anything that writes (onboarding)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Read-only session on the replica (or the primary when none is configured)."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend.embeddings import provider_id
+
+# Embedding File Config
+# EMBEDDING_SNAPSHOT_PATH: when set, API workers mmap dish vectors from this file instead of
+# each pulling them from Postgres (see backend.snapshot). Unset -> feature off.
+EMBEDDING_SNAPSHOT_PATH = os.getenv("EMBEDDING_SNAPSHOT_PATH")
+# float32 is mapped zero-copy (one physical copy for all workers); float16 halves the file but
+# every worker converts the restaurants it ranks back to float32.
+EMBEDDING_SNAPSHOT_DTYPE = os.getenv("EMBEDDING_SNAPSHOT_DTYPE", "float32")
+EXPORT_CHUNK_ROWS = int(os.getenv("EMBEDDING_SNAPSHOT_CHUNK_ROWS", "10000"))
+
+# Layout: MAGIC | uint32 header length | JSON header | sections, each 64-byte aligned.
+# Rows are grouped by restaurant (restaurant_offsets[i]:restaurant_offsets[i+1]) and ordered
+# by dish id inside a restaurant, the same order MenuSnapshot loads rows in.
+MAGIC = b"CUREMB01"
+FORMAT_VERSION = 1
+_ALIGN = 64
+
+class RestaurantSlice(NamedTuple):
+    version: int
+    ids: np.ndarray            # dish ids (bytes, fixed width)
+    embeddings: np.ndarray     # (n, dim) view into the mapping
+    has_embedding: np.ndarray  # (n,) bool
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def generation_of(restaurant_versions) -> str:
+    """Fingerprint of every (restaurant id, menu_version): changes whenever any dish changes."""
+    digest = hashlib.sha256()
+    for restaurant_id, version in restaurant_versions:
+        digest.update(f"{restaurant_id}:{version}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def current_generation(connection) -> str:
+    rows = connection.execute(text("SELECT id, menu_version FROM restaurants ORDER BY id")).all()
+    return generation_of(rows)
+
+class EmbeddingFile:
+    """Read-only view of an exported file. Every section is an np.memmap over the same mapping."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an embedding snapshot")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(header_length))
+        if self.header["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding snapshot format {self.header['format']}")
+
+        self.generation = self.header["generation"]
+        self.dim = self.header["dim"]
+        self.count = self.header["count"]
+        # Only this provider's vectors are flagged in has_embedding (None: written before providers)
+        self.provider = self.header.get("provider")
+        self.embeddings = self._section("matrix", self.header["dtype"], (self.count, self.dim))
+        self.has_embedding = self._section("has_embedding", "bool", (self.count,))
+        self.ids = self._section("ids", f"S{self.header['id_width']}", (self.count,))
+        m = self.header["restaurants"]
+        restaurant_ids = self._section("restaurant_ids", f"S{self.header['restaurant_id_width']}", (m,))
+        self.offsets = self._section("restaurant_offsets", "<i8", (m + 1,))
+        self.versions = self._section("restaurant_versions", "<i8", (m,))
+        self.index = {rid.decode("utf-8"): i for i, rid in enumerate(restaurant_ids)}
+
+    def _section(self, name: str, dtype: str, shape: Tuple[int, ...]) -> np.ndarray:
+        offset, _ = self.header["sections"][name]
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    def restaurant(self, restaurant_id: str) -> Optional[RestaurantSlice]:
+        i = self.index.get(restaurant_id)
+        if i is None:
+            return None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return RestaurantSlice(
+            version=int(self.versions[i]),
+            ids=self.ids[start:end],
+            embeddings=self.embeddings[start:end],
+            has_embedding=self.has_embedding[start:end],
+        )
+
+def export_embeddings(engine: Engine, path: str, dtype: str = None, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Dict:
+    """
+    Writes every live dish embedding to `path`, atomically: the file is built next to the
+    target and os.replace()d in, so readers see the old file or the new one, never half of one
+    (already-mapped readers keep the old inode until they reopen).
+    Reads run in one REPEATABLE READ transaction, so vectors and menu_versions agree.
+    Vectors of other embedding providers are exported as missing.
+    Returns the header.
+    """
+    dtype = np.dtype(dtype or EMBEDDING_SNAPSHOT_DTYPE)
+    provider = provider_id()
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as connection:
+        with connection.begin():
+            restaurants = connection.execute(text(
+                "SELECT r.id, r.menu_version, count(d.id) FROM restaurants r "
+                "LEFT JOIN dishes d ON d.restaurant_id = r.id AND d.deleted_at IS NULL "
+                "GROUP BY r.id, r.menu_version ORDER BY r.id"
+            )).all()
+            id_width = connection.execute(text(
+                "SELECT coalesce(max(octet_length(id)), 1) FROM dishes WHERE deleted_at IS NULL"
+            )).scalar()
+            dim = connection.execute(text(
+                "SELECT coalesce(max(vector_dims(embedding)), 768) FROM dishes WHERE deleted_at IS NULL"
+            )).scalar()
+
+            count = sum(r[2] for r in restaurants)
+            m = len(restaurants)
+            restaurant_id_width = max([len(r[0].encode("utf-8")) for r in restaurants] or [1])
+            sizes = {
+                "matrix": count * dim * dtype.itemsize,
+                "has_embedding": count,
+                "ids": count * id_width,
+                "restaurant_ids": m * restaurant_id_width,
+                "restaurant_offsets": (m + 1) * 8,
+                "restaurant_versions": m * 8,
+            }
+            header = {
+                "format": FORMAT_VERSION,
+                "dtype": dtype.str,
+                "dim": dim,
+                "count": count,
+                "provider": provider,
+                "restaurants": m,
+                "id_width": id_width,
+                "restaurant_id_width": restaurant_id_width,
+                "generation": generation_of((r[0], r[1]) for r in restaurants),
+                "created_at": time.time(),
+                "sections": {},
+            }
+            # Header size depends on the offsets it contains: reserve generously, then lay out
+            offset = _aligned(len(MAGIC) + 4 + 4096 + 64 * len(sizes))
+            for name, size in sizes.items():
+                header["sections"][name] = [offset, size]
+                offset = _aligned(offset + size)
+            header_bytes = json.dumps(header).encode("utf-8")
+            if len(MAGIC) + 4 + len(header_bytes) > header["sections"]["matrix"][0]:
+                raise RuntimeError("Embedding snapshot header overflows its reserved space")
+
+            with open(tmp_path, "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<I", len(header_bytes)))
+                f.write(header_bytes)
+                f.truncate(offset)
+
+            def section(name, section_dtype, shape):
+                if 0 in shape:
+                    return np.zeros(shape, dtype=section_dtype)
+                return np.memmap(tmp_path, dtype=section_dtype, mode="r+", offset=header["sections"][name][0], shape=shape)
+
+            try:
+                offsets = section("restaurant_offsets", "<i8", (m + 1,))
+                offsets[0] = 0
+                offsets[1:] = np.cumsum([r[2] for r in restaurants], dtype=np.int64)
+                section("restaurant_versions", "<i8", (m,))[:] = [r[1] for r in restaurants]
+                section("restaurant_ids", f"S{restaurant_id_width}", (m,))[:] = [r[0].encode("utf-8") for r in restaurants]
+
+                matrix = section("matrix", dtype, (count, dim))
+                has_embedding = section("has_embedding", "bool", (count,))
+                ids = section("ids", f"S{id_width}", (count,))
+
+                # Same ORDER BY as above (restaurant id collation), so rows land in their restaurant's range
+                result = connection.execution_options(stream_results=True, yield_per=chunk_rows).execute(text(
+                    "SELECT id, embedding::text, embedding_provider FROM dishes "
+                    "WHERE deleted_at IS NULL ORDER BY restaurant_id, id"
+                ))
+                i = 0
+                for chunk in result.partitions(chunk_rows):
+                    for dish_id, embedding, embedding_provider in chunk:
+                        ids[i] = dish_id.encode("utf-8")
+                        if embedding is not None and embedding_provider == provider:
+                            matrix[i] = np.fromstring(embedding[1:-1], dtype=np.float32, sep=",")
+                            has_embedding[i] = True
+                        i += 1
+                if i != count:
+                    raise RuntimeError(f"Expected {count} dishes, streamed {i}")
+
+                for array in (matrix, has_embedding, ids, offsets):
+                    if isinstance(array, np.memmap):
+                        array.flush()
+                with open(tmp_path, "rb+") as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    return header
+
+def refresh_embeddings(engine: Engine, path: str, dtype: str = None) -> bool:
+    """Re-exports only if the menu fingerprint moved since the file was written. True if rewritten."""
+    try:
+        current = EmbeddingFile(path)
+        # A file written for another provider is stale whatever its generation
+        existing = current.generation if current.provider == provider_id() else None
+    except (OSError, ValueError):
+        existing = None
+    with engine.connect() as connection:
+        if existing is not None and existing == current_generation(connection):
+            return False
+    export_embeddings(engine, path, dtype)
+    return True
+
+if __name__ == "__main__":
+    # Usage: python -m backend.embedding_file [export|refresh] [path]
+    from backend.database import engine
+
+    action = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    path = sys.argv[2] if len(sys.argv) > 2 else EMBEDDING_SNAPSHOT_PATH
+    if not path or action not in ("export", "refresh"):
+        print("Usage: python -m backend.embedding_file [export|refresh] [path] (or set EMBEDDING_SNAPSHOT_PATH)")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    rewritten = True
+    if action == "export":
+        export_embeddings(engine, path)
+    else:
+        rewritten = refresh_embeddings(engine, path)
+
+    if rewritten:
+        info = EmbeddingFile(path)
+        print(f"✅ Exported {info.count} embeddings ({info.header['restaurants']} restaurants) to {path} "
+              f"in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"✅ {path} is up to date")
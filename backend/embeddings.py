@@ -0,0 +1,231 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.gemini import EMBEDDING_MODEL, GeminiClient
+
+# Embedding Provider Config
+# EMBEDDING_PROVIDER: "gemini" (text-embedding-004 over the API) | "local" (sentence-transformers,
+#   in-process on CPU: no network, no key). Every stored vector records the provider that made
+#   it (embedding_provider / embedding_dim), and only vectors of the active provider are ever
+#   compared, so switching providers degrades to "unranked" until re-embedded, never to noise.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini").lower()
+# The vector columns are vector(768): the local model has to produce 768 dims (all-mpnet-base-v2 does)
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+LOCAL_EMBEDDING_DEVICE = os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+# The request path fails fast and isn't throttled by the seeders' token bucket (0 = no
+# client-side limit); the seeders build their own GeminiClient with full backoff
+EMBEDDING_REQUEST_MAX_RETRIES = int(os.getenv("EMBEDDING_REQUEST_MAX_RETRIES", "1"))
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "0"))
+EMBEDDING_REQUEST_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_REQUEST_MAX_CONCURRENCY", "64"))
+
+EMBEDDING_DIM = 768
+
+class EmbeddingUnavailable(RuntimeError):
+    """No vector could be produced. Callers degrade (unranked / no profile), never use zeros."""
+
+def provider_id(name: Optional[str] = None, model: Optional[str] = None) -> str:
+    """'provider:model', the value stored in embedding_provider. Defaults to the active provider."""
+    name = name or EMBEDDING_PROVIDER
+    if model is None:
+        model = EMBEDDING_MODEL if name == "gemini" else LOCAL_EMBEDDING_MODEL
+    return f"{name}:{model}"
+
+def usable(vector, vector_provider: Optional[str]):
+    """The stored vector if the active provider made it, else None (not comparable)."""
+    if vector is None or vector_provider != provider_id():
+        return None
+    return vector
+
+class EmbeddingProvider:
+    name = "base"
+
+    def __init__(self, model: str, dim: int = EMBEDDING_DIM):
+        self.model = model
+        self.dim = dim
+
+    @property
+    def id(self) -> str:
+        return provider_id(self.name, self.model)
+
+    def warm(self):
+        """Pay one-off setup (client, model weights) at startup instead of on the first request."""
+
+    async def aembed_many(self, texts: Sequence[str], task_type: Optional[str] = None) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_many(self, texts: Sequence[str], task_type: Optional[str] = None) -> List[List[float]]:
+        """Sync twin for scripts (not callable from inside a running event loop)."""
+        return asyncio.run(self.aembed_many(texts, task_type))
+
+    async def aembed(self, text: str, task_type: Optional[str] = None) -> List[float]:
+        return (await self.aembed_many([text], task_type))[0]
+
+    def embed(self, text: str, task_type: Optional[str] = None) -> List[float]:
+        return self.embed_many([text], task_type)[0]
+
+    def _checked(self, vectors, count: int) -> List[List[float]]:
+        if len(vectors) != count:
+            raise EmbeddingUnavailable(f"{self.id} returned {len(vectors)} vectors for {count} texts")
+        for vector in vectors:
+            if len(vector) != self.dim:
+                raise EmbeddingUnavailable(f"{self.id} returned {len(vector)} dims, expected {self.dim}")
+        return vectors
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """text-embedding-004 through the shared, rate-limited GeminiClient (backend.gemini)."""
+    name = "gemini"
+
+    def __init__(self, client: Optional[GeminiClient] = None):
+        super().__init__(EMBEDDING_MODEL)
+        self._client = client
+
+    def _gemini(self) -> GeminiClient:
+        if self._client is None:
+            try:
+                self._client = GeminiClient(
+                    requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+                    max_concurrency=EMBEDDING_REQUEST_MAX_CONCURRENCY,
+                    max_retries=EMBEDDING_REQUEST_MAX_RETRIES,
+                )
+            except ValueError as e:
+                raise EmbeddingUnavailable(str(e)) from e
+        return self._client
+
+    def warm(self):
+        try:
+            self._gemini()
+        except EmbeddingUnavailable:
+            pass  # Reported per request; the API still serves unranked results
+
+    async def aembed_many(self, texts: Sequence[str], task_type: Optional[str] = None) -> List[List[float]]:
+        try:
+            vectors = await self._gemini().embed_many(list(texts), task_type)
+        except EmbeddingUnavailable:
+            raise
+        except Exception as e:
+            raise EmbeddingUnavailable(f"Gemini embedding failed: {e}") from e
+        return self._checked(vectors, len(texts))
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    sentence-transformers in this process, on CPU. The model loads on first use (or warm()).
+    Concurrent async callers are coalesced: texts queued while an encode() runs go out
+    together in the next one (up to batch_size), on a single worker thread, since torch
+    already spreads one batch over every core.
+    """
+    name = "local"
+
+    def __init__(self, model: str = LOCAL_EMBEDDING_MODEL, device: str = LOCAL_EMBEDDING_DEVICE,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        super().__init__(model)
+        self.device = device
+        self.batch_size = batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-embedding")
+        self._pending = []  # (text, future)
+        self._drain_task = None
+        self.batches = 0
+        self.texts = 0
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise EmbeddingUnavailable("EMBEDDING_PROVIDER=local needs `pip install sentence-transformers`") from e
+                model = SentenceTransformer(self.model, device=self.device)
+                dim = model.get_sentence_embedding_dimension()
+                if dim != self.dim:
+                    raise EmbeddingUnavailable(f"{self.model} produces {dim}-dim vectors, the embedding columns are vector({self.dim})")
+                self._model = model
+        return self._model
+
+    def warm(self):
+        self._load()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._load().encode(texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True)
+        self.batches += 1
+        self.texts += len(texts)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_many(self, texts: Sequence[str], task_type: Optional[str] = None) -> List[List[float]]:
+        return self._checked(self._encode(list(texts)), len(texts))
+
+    async def aembed_many(self, texts: Sequence[str], task_type: Optional[str] = None) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        self._pending.extend(zip(texts, futures))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain())
+        return self._checked(list(await asyncio.gather(*futures)), len(texts))
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:len(batch)]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode, [text for text, _ in batch])
+            except Exception as e:
+                error = e if isinstance(e, EmbeddingUnavailable) else EmbeddingUnavailable(f"Local embedding failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+PROVIDERS = {
+    "gemini": GeminiEmbeddingProvider,
+    "local": LocalEmbeddingProvider,
+}
+_instances: Dict[str, EmbeddingProvider] = {}
+
+def get_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """Process-wide provider instance (defaults to EMBEDDING_PROVIDER)."""
+    name = name or EMBEDDING_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER: {name}")
+    if name not in _instances:
+        _instances[name] = PROVIDERS[name]()
+    return _instances[name]
+
+def batch_provider(client: Optional[GeminiClient] = None) -> EmbeddingProvider:
+    """For seeders / jobs: Gemini through `client` (default: full retry budget), else the shared provider."""
+    if EMBEDDING_PROVIDER == "gemini":
+        return GeminiEmbeddingProvider(client or GeminiClient())
+    return get_provider()
+
+def schema_patches() -> List[str]:
+    """
+    Idempotent DDL for backend.migrations: provider / dim columns next to every vector.
+    Rows embedded before the columns existed all came from Gemini, so they are labelled
+    once, when the column is added.
+    """
+    legacy = provider_id("gemini")
+    statements = []
+    for table, vector_column in (("dishes", "embedding"), ("users", "taste_embedding")):
+        statements.append(f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = '{table}' AND column_name = 'embedding_provider'
+    ) THEN
+        ALTER TABLE {table} ADD COLUMN embedding_provider VARCHAR(128);
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS embedding_dim INTEGER;
+        UPDATE {table} SET embedding_provider = '{legacy}', embedding_dim = vector_dims({vector_column})
+        WHERE {vector_column} IS NOT NULL;
+    END IF;
+END $$""")
+    return statements
@@ -1,53 +1,86 @@
+import os
 from sqlalchemy.orm import Session
-from sqlalchemy import not_
-from typing import List
+from typing import List, Optional, Tuple
 import random
 
 from backend.models import User, Dish, Restaurant
 from backend.schemas import MealBundle, DishResponse
+from backend.queries import safe_dishes_query, unranked_dishes_query
+from backend.indexes import apply_search_settings, ef_search_for
+from backend.vectors import rerank_candidates
+from backend.snapshot import SnapshotStore, snapshot_store
+from backend.embeddings import usable
+from backend.bundles import BUNDLE_CANDIDATES, best_bundle, price_cap, scores_from_distances
+
+# "sql" (pgvector ranks) | "snapshot" (in-process NumPy ranks over a cached menu)
+RECOMMENDATION_RANKER = os.getenv("RECOMMENDATION_RANKER", "sql").lower()
+
+# How many ranked dishes the bundling step gets to choose from
+RANK_LIMIT = BUNDLE_CANDIDATES
+
+class SqlRanker:
+    """
+    Safety filter + vector ordering + LIMIT in one statement (see backend.queries).
+    Returns (dish, distance) best first; distance is None when it can't be compared.
+    """
+    def rank(self, db: Session, user: User, restaurant_id: str, search_vector, limit: int) -> List[Tuple[Dish, Optional[float]]]:
+        query = safe_dishes_query(
+            restaurant_id=restaurant_id,
+            allergens=user.allergens_strict,
+            constraints=user.constraints,
+            search_vector=search_vector,
+            limit=limit,
+            with_distance=search_vector is not None,
+        )
+        if search_vector is None:
+            return [(dish, None) for dish in db.execute(query).scalars().all()]
+        apply_search_settings(db, ef_search=ef_search_for(rerank_candidates(limit)))
+        ranked = [(dish, distance) for dish, distance in db.execute(query).all()]
+        if len(ranked) < limit:
+            # Dishes without a comparable vector follow the ranked ones, in menu order
+            rest = unranked_dishes_query(restaurant_id, user.allergens_strict, user.constraints, limit - len(ranked))
+            ranked += [(dish, None) for dish in db.execute(rest).scalars().all()]
+        return ranked
+
+class SnapshotRanker:
+    """
+    Ranks against a process-local MenuSnapshot: a masked matrix-vector product plus
+    argpartition, no per-request dish query once the menu is warm.
+    """
+    def __init__(self, store: Optional[SnapshotStore] = None):
+        self.store = store or snapshot_store
+
+    def rank(self, db: Session, user: User, restaurant_id: str, search_vector, limit: int) -> List[Tuple[DishResponse, float]]:
+        snapshot = self.store.get(db, restaurant_id)
+        return snapshot.rank(search_vector, user.allergens_strict, user.constraints, limit)
+
+def make_ranker(name: str = None):
+    name = name or RECOMMENDATION_RANKER
+    if name == "snapshot":
+        return SnapshotRanker()
+    if name == "sql":
+        return SqlRanker()
+    raise ValueError(f"Unknown RECOMMENDATION_RANKER: {name}")
 
 class RecommendationEngine:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, ranker=None):
         self.db = db
+        self.ranker = ranker or make_ranker()
 
     def _get_safe_dishes(self, user: User, restaurant_id: str) -> List[Dish]:
         """
         HARD GUARDRAIL: Returns ONLY dishes that are safe for the user.
         Strict Set-Difference: Dish Allergens - User Strict Allergens must be Empty.
         """
-        # 1. Fetch all dishes for the restaurant
-        all_dishes = self.db.query(Dish).filter(Dish.restaurant_id == restaurant_id, Dish.is_available == True).all()
-        
-        safe_dishes = []
-        user_strict_allergens = set(user.allergens_strict) if user.allergens_strict else set()
-        
-        for dish in all_dishes:
-            dish_allergens = set(dish.allergens) if dish.allergens else set()
-            
-            # CRITICAL CHECK: Intersection must be empty
-            if not dish_allergens.isdisjoint(user_strict_allergens):
-                # LOGGING WOULD GO HERE: Blocked dish {dish.name} due to {dish_allergens & user_strict_allergens}
-                continue
-            
-            # Dietary Constraint Check (e.g. Vegan)
-            # This is simpler: if user is Vegan, dish must have "vegan" tag? 
-            # TDD says "diet_type = user.diet". Let's assume constraints are inclusive requirements.
-            # If user has constraints, dish tags must include ALL of them? OR at least one?
-            # TDD: "Filter WHERE... diet_type = user.diet".
-            # Let's implement: If user has constraints, dish tags must match.
-            # For MVP, strict allergens is the red line. Constraints are often preferences or strict.
-            # Let's enforce constraints strictly if present.
-            
-            if user.constraints:
-                user_constraints = set(user.constraints)
-                dish_tags = set(dish.tags) if dish.tags else set()
-                # If user wants Vegan, dish MUST be Vegan.
-                if not user_constraints.issubset(dish_tags):
-                   continue
-
-            safe_dishes.append(dish)
-            
-        return safe_dishes
+        # Allergen overlap, constraint containment and availability are all pushed into SQL
+        # (see backend.queries) so this stays in lock-step with the API endpoint.
+        # TDD: "Filter WHERE... diet_type = user.diet" -> dish tags must include ALL user constraints.
+        query = safe_dishes_query(
+            restaurant_id=restaurant_id,
+            allergens=user.allergens_strict,
+            constraints=user.constraints,
+        )
+        return self.db.execute(query).scalars().all()
 
     def _mock_vector_search(self, user: User, candidates: List[Dish]) -> List[Dish]:
         """
@@ -65,42 +98,61 @@ class RecommendationEngine:
         if not user:
             raise ValueError("User not found")
             
-        # Step 1 & 2: Get Safe Menu
-        safe_dishes = self._get_safe_dishes(user, restaurant_id)
-        
-        if not safe_dishes:
+        # Step 1-3: Safe Menu + Semantic Ranking (pluggable ranker), top BUNDLE_CANDIDATES
+        taste_vector = usable(user.taste_embedding, user.embedding_provider)
+        if taste_vector is not None:
+            ranked = self.ranker.rank(self.db, user, restaurant_id, taste_vector, RANK_LIMIT)
+        else:
+            # No taste profile yet: nothing to rank by, fall back to the mock (its order is the score)
+            ranked = [(dish, float(i)) for i, dish in enumerate(self._mock_vector_search(user, self._get_safe_dishes(user, restaurant_id)))]
+
+        if not ranked:
             return [] # No safe options
-            
-        # Step 3: Semantic Ranking (Mock)
-        ranked_dishes = self._mock_vector_search(user, safe_dishes)
         
-        # Step 4: Simple Bundling Logic (Greedy)
-        # Bundle 1: Top Rated (Single Item)
+        # Step 4: Budget-aware Bundling (backend.bundles)
+        # Every bundle maximizes summed similarity over the candidates, with its total price
+        # under the cap for User.budget_setting and no dish above User.spice_tolerance.
+        # Budget and spice are preferences (allergens were already hard-filtered above).
+        dishes = [dish for dish, _ in ranked]
+        scores = scores_from_distances([distance for _, distance in ranked])
+        prices = [dish.price for dish in dishes]
+        caps = dict(
+            price_cap=price_cap(user.budget_setting),
+            spice_levels=[dish.spice_level for dish in dishes],
+            spice_cap=user.spice_tolerance,
+        )
         bundles = []
-        
-        if ranked_dishes:
-            best_dish = ranked_dishes[0]
+
+        # Bundle 1: Top Pick (best single dish within the caps, else the best match overall)
+        top = best_bundle(scores, prices, 1, **caps)
+        best_dish = dishes[top.indices[0] if top else 0]
+        bundles.append(MealBundle(
+            title="The Top Pick",
+            dishes=[DishResponse.model_validate(best_dish)],
+            total_price=best_dish.price,
+            explanation=f"Based on your taste profile, we think you'll love the {best_dish.name}."
+        ))
+
+        # Bundle 2: Perfect Pairing (best two dishes that fit the budget together)
+        pair = best_bundle(scores, prices, 2, **caps)
+        if pair:
+            main, side = (dishes[i] for i in pair.indices)
             bundles.append(MealBundle(
-                title="The Top Pick",
-                dishes=[DishResponse.model_validate(best_dish)],
-                total_price=best_dish.price,
-                explanation=f"Based on your taste profile, we think you'll love the {best_dish.name}."
+                title="Perfect Pairing",
+                dishes=[DishResponse.model_validate(main), DishResponse.model_validate(side)],
+                total_price=pair.total_price,
+                explanation=f"Try the {main.name} with a side of {side.name}."
             ))
-            
-        # Bundle 2: Chef's Combo (If 2 items exist)
-        if len(ranked_dishes) >= 2:
-             main = ranked_dishes[0]
-             side = ranked_dishes[1]
-             # Check budget
-             total_price = main.price + side.price
-             # Mock budget check (User budget 1=$, 2=$$, 3=$$$)
-             # Let's assume budget 2 allows up to $50
-             
-             bundles.append(MealBundle(
-                 title="Perfect Pairing",
-                 dishes=[DishResponse.model_validate(main), DishResponse.model_validate(side)],
-                 total_price=total_price,
-                 explanation=f"Try the {main.name} with a side of {side.name}."
-             ))
-             
+
+        # Bundle 3: Full Meal (three courses under the same budget)
+        meal = best_bundle(scores, prices, 3, **caps)
+        if meal:
+            courses = [dishes[i] for i in meal.indices]
+            bundles.append(MealBundle(
+                title="Full Meal",
+                dishes=[DishResponse.model_validate(dish) for dish in courses],
+                total_price=meal.total_price,
+                explanation=f"A full meal for your budget: {', '.join(dish.name for dish in courses)}."
+            ))
+
         return bundles
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import random
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# google-genai (and httpx, which it brings) is imported where it is used: it is the heaviest import in the API process,
+# and backend.main should not pay for it before the first Gemini call.
+if TYPE_CHECKING:
+    from google import genai
+
+# Gemini Config (env driven, same as the DB settings in main.py)
+# GEMINI_BASE_URL points every call at another endpoint, e.g. tests/fake_gemini.py
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+EMBEDDING_MODEL = "text-embedding-004"
+ENRICHMENT_MODEL = "gemini-2.5-flash"
+
+# batchEmbedContents accepts at most 100 texts per request
+GEMINI_EMBED_BATCH_SIZE = int(os.getenv("GEMINI_EMBED_BATCH_SIZE", "100"))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "1.0"))
+
+# Rate limited / overloaded / transient server errors are worth another try; 4xx otherwise is a bug
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+def make_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> Optional["genai.Client"]:
+    """genai.Client honouring GEMINI_BASE_URL. None when no API key is configured."""
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    from google import genai
+    from google.genai import types
+
+    base_url = base_url or GEMINI_BASE_URL
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Callers wait in acquire() instead of sleeping a fixed interval per request.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+def enrichment_fallback(item_name: str) -> Dict[str, Any]:
+    """Placeholder for a dish that could not be enriched: allergens unknown (None), never []."""
+    return {"description": f"A delicious {item_name}", "allergens": None, "fallback": True}
+
+def _is_retryable(error: Exception) -> bool:
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+class GeminiClient:
+    """
+    Shared Gemini wrapper for the seeders: batched embeddings and dish enrichment.
+    Every request goes through one concurrency limit, one token bucket and
+    retry with exponential backoff + jitter.
+    """
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 batch_size: int = GEMINI_EMBED_BATCH_SIZE,
+                 requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE,
+                 burst: int = GEMINI_BURST,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff_seconds: float = GEMINI_BACKOFF_SECONDS):
+        self.client = make_client(api_key, base_url)
+        if self.client is None:
+            raise ValueError("GOOGLE_API_KEY is not set in .env file")
+        self.batch_size = batch_size
+        # requests_per_minute <= 0: no client-side rate limit (the API quota is the limit)
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst) if requests_per_minute > 0 else None
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self._loop = None
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.requests = 0
+        self.retries = 0
+
+    def _bind_loop(self):
+        # asyncio primitives belong to one event loop; the seeders call asyncio.run() per menu
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            if self.bucket is not None:
+                self.bucket._lock = asyncio.Lock()
+
+    async def _call(self, fn: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        self._bind_loop()
+        attempt = 0
+        while True:
+            async with self.semaphore:
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                self.requests += 1
+                try:
+                    return await fn(**kwargs)
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    error = e
+            # Back off outside the semaphore so other requests keep flowing
+            delay = min(30.0, self.backoff_seconds * (2 ** attempt)) * (0.5 + random.random())
+            attempt += 1
+            self.retries += 1
+            print(f"⚠️ Gemini retry {attempt}/{self.max_retries} in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+
+    async def _embed_batch(self, texts: Sequence[str], task_type: str) -> List[List[float]]:
+        from google.genai import types
+
+        response = await self._call(
+            self.client.aio.models.embed_content,
+            model=EMBEDDING_MODEL,
+            contents=list(texts),
+            config=types.EmbedContentConfig(task_type=task_type),
+        )
+        if len(response.embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(response.embeddings)}")
+        return [list(embedding.values) for embedding in response.embeddings]
+
+    async def embed_many(self, texts: Sequence[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[List[float]]:
+        """One vector per text, in order. Texts are sent `batch_size` per request, batches run concurrently."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._embed_batch(batch, task_type) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def get_embedding(self, text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
+        return (await self.embed_many([text], task_type))[0]
+
+    async def enrich_dish(self, item_name: str, grouping: str) -> Dict[str, Any]:
+        """
+        Uses Gemini to generate description and allergens. On failure returns a placeholder
+        description with allergens None (unknown, never a confirmed empty list) and
+        fallback True: callers must store it as not enriched so the next sync retries it.
+        """
+        prompt = f"""
+    Describe the dish '{item_name}' (Category: {grouping}).
+    Provide a 1-sentence description and a list of common allergens.
+    Return ONLY valid JSON with this format:
+    {{
+        "description": "...",
+        "allergens": ["..."]
+    }}
+    """
+        from google.genai import types
+
+        try:
+            response = await self._call(
+                self.client.aio.models.generate_content,
+                model=ENRICHMENT_MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(response_mime_type="application/json"),
+            )
+            enriched = json.loads(response.text)
+            if not isinstance(enriched.get("allergens"), list):
+                raise ValueError(f"no allergen list in {response.text!r}")
+            return {"description": enriched.get("description") or item_name, "allergens": enriched["allergens"], "fallback": False}
+        except Exception as e:
+            print(f"Error enriching dish {item_name}: {e}")
+            return enrichment_fallback(item_name)
+
+    async def enrich_many(self, items: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """enrich_dish for every (item_name, grouping), concurrently, in order."""
+        return await asyncio.gather(*(self.enrich_dish(name, grouping) for name, grouping in items))
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "retries": self.retries}
@@ -0,0 +1,169 @@
+import os
+import sys
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import vectors
+
+# Index Config (env driven, same as the DB settings in main.py)
+# VECTOR_INDEX_METHOD: "hnsw" | "ivfflat" | "none"
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw").lower()
+# VECTOR_INDEX_SCOPE: "global" | "restaurant"
+#   global     -> one ANN index over every dish (catalogue-wide search).
+#   restaurant -> also a btree on restaurant_id: per-menu ranking reads only that
+#                 restaurant's rows and ranks them exactly (backend.queries), so it never
+#                 depends on an ANN scan finding LIMIT rows that pass the filters.
+# In both scopes ANN scans iterate past rows the WHERE clause filters out (pgvector >= 0.8),
+# so the global search's safety filters don't cut its candidate pool short either.
+VECTOR_INDEX_SCOPE = os.getenv("VECTOR_INDEX_SCOPE", "restaurant").lower()
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+# pgvector rejects hnsw.ef_search above 1000
+HNSW_EF_SEARCH_MAX = 1000
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+
+# Operator class must match the distance used in ORDER BY (see backend.vectors).
+# With VECTOR_COMPACT the ANN index covers the compact column instead of the full vectors.
+# Changing VECTOR_DISTANCE keeps the index name: run `python -m backend.indexes rebuild`.
+EMBEDDING_INDEX_NAMES = {
+    "hnsw": "ix_dishes_embedding_hnsw",
+    "ivfflat": "ix_dishes_embedding_ivfflat",
+    "hnsw_compact": "ix_dishes_embedding_compact_hnsw",
+    "ivfflat_compact": "ix_dishes_embedding_compact_ivfflat",
+}
+RESTAURANT_INDEX_NAME = "ix_dishes_restaurant_id"
+
+# Iterative index scans need pgvector >= 0.8; older servers reject the GUC outright.
+# Detected once at startup by create_vector_indexes() / detect_search_capabilities().
+_iterative_scan_supported = False
+
+def _detect_iterative_scan(connection) -> bool:
+    version = vectors.pgvector_version(connection)
+    return version is not None and version >= (0, 8)
+
+def _embedding_index_ddl(method: str) -> str:
+    if method not in ("hnsw", "ivfflat"):
+        raise ValueError(f"Unknown VECTOR_INDEX_METHOD: {method}")
+    if vectors.compact_enabled():
+        name = EMBEDDING_INDEX_NAMES[f"{method}_compact"]
+        target = f"{vectors.COMPACT_COLUMN} {vectors.compact_ops()}"
+    else:
+        name = EMBEDDING_INDEX_NAMES[method]
+        target = f"embedding {vectors.full_ops()}"
+    if method == "hnsw":
+        options = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    else:
+        options = f"lists = {IVFFLAT_LISTS}"
+    return f"CREATE INDEX IF NOT EXISTS {name} ON dishes USING {method} ({target}) WITH ({options})"
+
+def managed_index_ddl(method: str = None, scope: str = None) -> List[str]:
+    """DDL for the indexes this module owns on the dishes table, for the given config."""
+    method = method or VECTOR_INDEX_METHOD
+    scope = scope or VECTOR_INDEX_SCOPE
+
+    statements = []
+    if method != "none":
+        # Full-vector and compact indexes are alternatives: keeping both defeats VECTOR_COMPACT
+        stale = method if vectors.compact_enabled() else f"{method}_compact"
+        statements.append(f"DROP INDEX IF EXISTS {EMBEDDING_INDEX_NAMES[stale]}")
+        statements.append(_embedding_index_ddl(method))
+    if scope == "restaurant":
+        statements.append(f"CREATE INDEX IF NOT EXISTS {RESTAURANT_INDEX_NAME} ON dishes (restaurant_id)")
+    return statements
+
+def create_vector_indexes(engine: Engine, method: str = None, scope: str = None):
+    """Creates the configured indexes if missing (idempotent, safe at startup)."""
+    global _iterative_scan_supported
+    with engine.begin() as connection:
+        _iterative_scan_supported = _detect_iterative_scan(connection)
+        for ddl in managed_index_ddl(method, scope):
+            connection.execute(text(ddl))
+
+def detect_search_capabilities(engine: Engine):
+    """Probe only (no DDL), for startups that leave schema management to someone else."""
+    global _iterative_scan_supported
+    with engine.connect() as connection:
+        _iterative_scan_supported = _detect_iterative_scan(connection)
+
+def drop_vector_indexes(engine: Engine):
+    """Drops every ANN/scope index we may have created, whatever the current config."""
+    with engine.begin() as connection:
+        for name in [*EMBEDDING_INDEX_NAMES.values(), RESTAURANT_INDEX_NAME]:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def rebuild_vector_indexes(engine: Engine, method: str = None, scope: str = None):
+    """
+    Drop + create. Needed after bulk loads (IVFFlat centroids are computed at build
+    time from the rows present) or when switching method/parameters.
+    """
+    drop_vector_indexes(engine)
+    create_vector_indexes(engine, method, scope)
+
+def ef_search_for(candidates: int) -> int:
+    """hnsw.ef_search able to surface `candidates` rows (HNSW returns at most ef_search)."""
+    return min(HNSW_EF_SEARCH_MAX, max(HNSW_EF_SEARCH, candidates))
+
+def search_settings(ef_search: int = None, probes: int = None) -> Dict[str, str]:
+    """ANN GUCs for one ranking query; callers may override the configured defaults."""
+    settings = {}
+    if VECTOR_INDEX_METHOD == "hnsw":
+        settings["hnsw.ef_search"] = str(min(HNSW_EF_SEARCH_MAX, ef_search or HNSW_EF_SEARCH))
+        if _iterative_scan_supported:
+            # pgvector >= 0.8: keep walking the graph until LIMIT rows survive the WHERE clause
+            settings["hnsw.iterative_scan"] = "strict_order"
+    elif VECTOR_INDEX_METHOD == "ivfflat":
+        settings["ivfflat.probes"] = str(probes or IVFFLAT_PROBES)
+        if _iterative_scan_supported:
+            settings["ivfflat.iterative_scan"] = "relaxed_order"
+    return settings
+
+def _search_settings_statement(ef_search: int = None, probes: int = None):
+    """
+    set_config(..., true) == SET LOCAL, so the values only live for the current
+    transaction and never leak into pooled connections. All settings go out in a
+    single SELECT to keep it to one extra round trip.
+    """
+    settings = search_settings(ef_search, probes)
+    if not settings:
+        return None, None
+    calls = ", ".join(f"set_config(:k{i}, :v{i}, true)" for i in range(len(settings)))
+    params = {}
+    for i, (key, value) in enumerate(settings.items()):
+        params[f"k{i}"] = key
+        params[f"v{i}"] = value
+    return text(f"SELECT {calls}"), params
+
+def apply_search_settings(db: Session, ef_search: int = None, probes: int = None):
+    """Per-query ANN knobs for a sync session."""
+    statement, params = _search_settings_statement(ef_search, probes)
+    if statement is not None:
+        db.execute(statement, params)
+
+async def aapply_search_settings(db: AsyncSession, ef_search: int = None, probes: int = None):
+    """Per-query ANN knobs for an async session."""
+    statement, params = _search_settings_statement(ef_search, probes)
+    if statement is not None:
+        await db.execute(statement, params)
+
+if __name__ == "__main__":
+    # Usage: python -m backend.indexes [create|rebuild|drop]
+    from backend.database import engine
+
+    action = sys.argv[1] if len(sys.argv) > 1 else "create"
+    if action == "create":
+        create_vector_indexes(engine)
+    elif action == "rebuild":
+        rebuild_vector_indexes(engine)
+    elif action == "drop":
+        drop_vector_indexes(engine)
+    else:
+        print(f"Unknown action: {action}")
+        sys.exit(1)
+    print(f"✅ Vector indexes {action}: method={VECTOR_INDEX_METHOD} scope={VECTOR_INDEX_SCOPE}")
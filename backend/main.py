@@ -1,62 +1,113 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException
+import time
+import asyncio
+import json
+import numpy as np
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Header
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, text, select
-from sqlalchemy.orm import sessionmaker, Session
-from typing import List, Optional
-from google import genai
-from google.genai import types
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from typing import TYPE_CHECKING, Dict, List, Optional
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
-from backend.models import Base, User, Dish
-from backend.schemas import MealBundle, RecommendationRequest, DishResponse, UserOnboardingRequest
+from backend.models import Base, User, Dish, Restaurant
+from backend.cache import EmbeddingCache, ExplanationCache, ResultCache, dish_content_version, etag_matches
+from backend.schemas import (
+    MealBundle, RecommendationRequest, DishResponse, UserOnboardingRequest,
+    BatchRecommendationRequest, BatchRecommendationResult,
+    SearchRequest, DishSearchHit, RestaurantSearchResult,
+)
+from backend.queries import safe_dishes_query, unranked_dishes_query, blocked_count, diversified_search_query
+from backend.indexes import aapply_search_settings, ef_search_for
+from backend.vectors import rerank_candidates
+from backend.engine import RECOMMENDATION_RANKER
+from backend.snapshot import snapshot_store
+from backend.profiles import UserProfile, profile_store
+from backend.gemini import make_client
+from backend.embeddings import EmbeddingUnavailable, get_provider, provider_id
+from backend import metrics
+from backend.metrics import count_blocked, count_fallback, stage
+# Re-exported: scripts used to import these from here
+from backend.database import (
+    DB_HOST, DB_PORT, DB_NAME, DB_REPLICA_HOST, MANAGE_SCHEMA,
+    engine, SessionLocal, async_engine, AsyncSessionLocal,
+    env_ok, init_database, has_replica, database_status, dispose_engines,
+    get_db, get_async_db, get_async_read_db,
+)
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+# Importing this module must stay cheap (worker boot / autoscaling): no connections, no DDL,
+# no SDK clients here. Those happen in lifespan() below or on first use.
 
 # Load env variables
 load_dotenv()
 
 # Configure Gemini
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-client = genai.Client(api_key=GOOGLE_API_KEY) if GOOGLE_API_KEY else None
-if not client:
-    print("⚠️ WARNING: GOOGLE_API_KEY not set.")
+_client = None
+_client_loaded = False
+
+def get_client():
+    """genai client, built on first use (honours GEMINI_BASE_URL, e.g. tests/fake_gemini.py). None without a key."""
+    global _client, _client_loaded
+    if not _client_loaded:
+        _client = make_client(GOOGLE_API_KEY)
+        _client_loaded = True
+    return _client
 
 # Configure Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
 
-if not supabase:
-    print("⚠️ WARNING: SUPABASE_URL or SUPABASE_KEY not set. Auth & Storage features will fail.")
+# Async Supabase client (created on first use, acreate_client has to be awaited)
+async_supabase: Optional["AsyncClient"] = None
+
+async def get_async_supabase() -> Optional["AsyncClient"]:
+    global async_supabase
+    if async_supabase is None and SUPABASE_URL and SUPABASE_KEY:
+        from supabase import acreate_client
+        async_supabase = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    return async_supabase
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 1. Config warnings
+    if not env_ok():
+        print("❌ CRITICAL: Missing Database/Env variables. Check .env file.")
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        print("⚠️ WARNING: SUPABASE_URL or SUPABASE_KEY not set. Auth & Storage features will fail.")
 
-# Database Setup
-# Database Setup
-DB_USER = os.getenv("POSTGRES_USER")
-DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-DB_HOST = os.getenv("POSTGRES_SERVER")
-DB_PORT = os.getenv("POSTGRES_PORT")
-DB_NAME = os.getenv("POSTGRES_DB")
+    # 2. Schema (extension, tables, patches, indexes) unless MANAGE_SCHEMA=false
+    print(f"🔌 CONNECTING TO DB: {DB_HOST}:{DB_PORT}/{DB_NAME} (manage schema: {MANAGE_SCHEMA})")
+    if has_replica():
+        print(f"📖 Read path on replica: {DB_REPLICA_HOST}")
+    try:
+        await asyncio.to_thread(init_database)
+    except Exception as e:
+        print(f"DB Interface Error: {e}")
 
-if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME]):
-    print("❌ CRITICAL: Missing Database/Env variables. Check .env file.")
+    # 3. Build the Gemini client now, so the first request doesn't pay for the SDK import
+    if not await asyncio.to_thread(get_client):
+        print("⚠️ WARNING: GOOGLE_API_KEY not set.")
 
-print(f"🔌 CONNECTING TO DB: {DB_HOST}:{DB_PORT}/{DB_NAME}")
-SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # 4. Embedding provider (local: load the model weights before taking traffic)
+    provider = get_provider()
+    print(f"🧭 Embedding provider: {provider.id}")
+    try:
+        await asyncio.to_thread(provider.warm)
+    except EmbeddingUnavailable as e:
+        print(f"⚠️ WARNING: {e}. Requests will be served unranked.")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    yield
 
-# Create Extension (Idempotent)
-try:
-    with engine.connect() as connection:
-        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        connection.commit()
-        # Create Tables
-        Base.metadata.create_all(bind=engine)
-except Exception as e:
-    print(f"DB Interface Error: {e}")
+    await dispose_engines()
 
-app = FastAPI(title="Curate API", version="v1")
+app = FastAPI(title="Curate API", version="v1", lifespan=lifespan)
 
 # CORS Middleware
 app.add_middleware(
@@ -65,151 +116,615 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    """
+    Per-request StageTimer: handlers mark stages with `with stage(...)`, and the durations
+    go out as a Server-Timing header and into the /metrics histograms. Streaming bodies
+    only report the stages that ran before the first byte.
+    """
+    timer = metrics.start_request()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    total = timer.finish(getattr(route, "path", "unmatched"), response.status_code)
+    if metrics.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = timer.server_timing(total)
+    return response
 
-def get_gemini_embedding(text: str) -> List[float]:
-    """Wrapper to get embedding from Gemini"""
-    if not client: return [0.0] * 768
-    try:
-        response = client.models.embed_content(
-            model="text-embedding-004",
-            contents=text
-        )
-        return response.embeddings[0].values
-    except Exception as e:
-        print(f"Embedding Error: {e}")
-        return [0.0] * 768
+# Mood Embedding Cache (users type the same few hundred moods), keyed by provider + model
+mood_embedding_cache = EmbeddingCache(
+    SessionLocal,
+    model=provider_id(),
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400")),
+    async_session_factory=AsyncSessionLocal,
+)
+
+def get_embedding(text: str) -> List[float]:
+    """Embedding from the active provider (served from the mood cache when possible). Raises EmbeddingUnavailable."""
+    cached = mood_embedding_cache.get(text)
+    if cached is not None:
+        return cached
+    vector = get_provider().embed(text)
+    mood_embedding_cache.set(text, vector)
+    return vector
+
+async def aget_embedding(text: str) -> List[float]:
+    """Async twin of get_embedding for the request path (no threadpool worker held)"""
+    cached = await mood_embedding_cache.aget(text)
+    if cached is not None:
+        return cached
+    vector = await get_provider().aembed(text)
+    await mood_embedding_cache.aset(text, vector)
+    return vector
 
-def generate_explanation(dish_name: str, dish_desc: str, user_profile: str) -> str:
-    """Uses Gemini Flash to explain the match"""
-    if not client: return f"We think you'll like the {dish_name} based on your profile."
+async def _mood_vector(mood: str) -> Optional[List[float]]:
+    """Mood embedding, or None when the provider is down (callers fall back to the taste profile)."""
     try:
-        prompt = f"""
+        with stage("embedding"):
+            return await aget_embedding(mood)
+    except EmbeddingUnavailable as e:
+        print(f"⚠️ Embedding Error: {e}")
+        count_fallback("embedding")
+        return None
+
+EXPLANATION_MODEL = "gemini-2.5-flash"
+
+# Explanation Cache (same dish + same context -> same sentence, no LLM time)
+explanation_cache = ExplanationCache(
+    SessionLocal,
+    model=EXPLANATION_MODEL,
+    maxsize=int(os.getenv("EXPLANATION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", "3600")),
+    persistent_ttl_seconds=float(os.getenv("EXPLANATION_CACHE_PERSISTENT_TTL_SECONDS", str(7 * 86400))),
+    async_session_factory=AsyncSessionLocal,
+)
+
+def _explanation_prompt(dish_name: str, dish_desc: str, user_profile: str) -> str:
+    return f"""
         Context: The user has these preferences: "{user_profile}".
         Task: Recommend the dish "{dish_name}" ({dish_desc}).
         Output: Write a single sentence explaining why this dish fits their specific taste. Speak directly to the user ("You'll love...").
         """
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+
+async def agenerate_explanation(dish_name: str, dish_desc: str, user_profile: str, dish_id: Optional[str] = None) -> str:
+    """Uses Gemini Flash to explain the match (cached per dish + context when dish_id is given)"""
+    dish_version = dish_content_version(dish_name, dish_desc)
+    if dish_id:
+        cached = await explanation_cache.aget(dish_id, dish_version, user_profile)
+        if cached is not None:
+            return cached
+
+    client = get_client()
+    if not client:
+        count_fallback("explanation")
+        return f"We think you'll like the {dish_name} based on your profile."
+    try:
+        response = await client.aio.models.generate_content(
+            model=EXPLANATION_MODEL,
+            contents=_explanation_prompt(dish_name, dish_desc, user_profile)
         )
-        return response.text.strip()
+        explanation = response.text.strip()
+        if dish_id:
+            await explanation_cache.aset(dish_id, dish_version, user_profile, explanation)
+        return explanation
     except Exception as e:
         print(f"GenAI Error: {e}")
+        count_fallback("explanation")
         return f"We think you'll like the {dish_name} based on your profile."
 
-@app.post("/api/v1/recommendations", response_model=List[MealBundle])
-def generate_recommendations(
-    request: RecommendationRequest, 
-    db: Session = Depends(get_db)
-):
-    print(f"🚀 Processing Request for User: {request.user_id}")
+# Request-wide deadline for LLM explanations (overridable per request)
+EXPLANATION_BUDGET_MS = int(os.getenv("EXPLANATION_BUDGET_MS", "2500"))
 
-    # 1. Fetch User
-    user = db.query(User).filter(User.id == request.user_id).first()
+# Explanations that miss the deadline keep running so their result lands in the cache, up to
+# EXPLANATION_BACKGROUND_MAX at a time per process; late ones beyond that are cancelled, so
+# sustained overload can't pile up LLM calls without bound.
+# Hold references here, otherwise the event loop may garbage collect them mid-flight.
+EXPLANATION_BACKGROUND_MAX = int(os.getenv("EXPLANATION_BACKGROUND_MAX", "64"))
+_background_tasks = set()
+
+async def iter_explanations_within_budget(dishes: List[Dish], fallbacks: List[str], user_context_str: str, budget_seconds: float):
+    """
+    Runs one explanation per dish concurrently and yields (index, explanation, is_fallback)
+    as each one completes, waiting at most budget_seconds in total.
+    Anything not finished (or failed) by then yields its fallback template, so latency is
+    bounded by the budget no matter how many bundles we return.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(budget_seconds, 0)
+    tasks = {
+        asyncio.create_task(agenerate_explanation(dish.name, dish.description or "", user_context_str, dish_id=dish.id)): i
+        for i, dish in enumerate(dishes)
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i = tasks[task]
+                if task.exception() is None:
+                    yield i, task.result(), False
+                else:
+                    count_fallback("explanation")
+                    yield i, fallbacks[i], True
+
+        if pending:
+            print(f"⏱️ {len(pending)} explanation(s) missed the {budget_seconds:.2f}s budget, using templates")
+            count_fallback("explanation_budget", len(pending))
+        for task in pending:
+            yield tasks[task], fallbacks[tasks[task]], True
+    finally:
+        dropped = 0
+        for task in pending:
+            if len(_background_tasks) < EXPLANATION_BACKGROUND_MAX:
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            else:
+                task.cancel()
+                dropped += 1
+        if dropped:
+            print(f"🛑 Cancelled {dropped} late explanation(s): {len(_background_tasks)} already finishing in the background")
+
+async def explain_within_budget(dishes: List[Dish], fallbacks: List[str], user_context_str: str, budget_seconds: float) -> List[str]:
+    """Collects iter_explanations_within_budget into a list aligned with dishes."""
+    explanations = list(fallbacks)
+    async for i, explanation, _ in iter_explanations_within_budget(dishes, fallbacks, user_context_str, budget_seconds):
+        explanations[i] = explanation
+    return explanations
+
+def _bundle_specs(ranked_dishes: List[Dish]):
+    """(title, dish, fallback explanation) for every bundle we return."""
+    top_dish = ranked_dishes[0]
+    specs = [("Top Match", top_dish, f"We think you'll like the {top_dish.name} based on your profile.")]
+    if len(ranked_dishes) > 1:
+        second = ranked_dishes[1]
+        specs.append(("Alternative Choice", second, f"A close second: {second.name}."))
+    return specs
+
+def _build_bundles(bundle_specs, explanations: List[str]) -> List[MealBundle]:
+    bundles = []
+    for (title, dish, _), explanation in zip(bundle_specs, explanations):
+        bundles.append(MealBundle(
+            title=title,
+            dishes=[DishResponse.model_validate(dish)],
+            total_price=dish.price,
+            explanation=explanation
+        ))
+    return bundles
+
+async def _get_users(db: AsyncSession, user_ids: List[str]) -> Dict[str, UserProfile]:
+    """
+    id -> UserProfile, from the profile cache or the read session. Ids the replica doesn't
+    have yet (onboarded a moment ago, replication lag) are retried once on the primary.
+    """
+    users_by_id = await profile_store.aget_many(db, user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in users_by_id]
+    if missing and has_replica():
+        async with AsyncSessionLocal() as primary:
+            found = await profile_store.aget_many(primary, missing)
+        if found:
+            print(f"📖 {len(found)} user(s) not on the replica yet, read from the primary")
+            count_fallback("replica_lag", len(found))
+        users_by_id.update(found)
+    return users_by_id
+
+async def _get_user(db: AsyncSession, user_id: str) -> UserProfile:
+    with stage("user_fetch"):
+        user = (await _get_users(db, [user_id])).get(user_id)
     if not user:
         print("❌ User not found in DB")
         raise HTTPException(status_code=404, detail="User not found")
+    return user
 
+async def _rank_for_request(request: RecommendationRequest, db: AsyncSession, user: UserProfile):
+    """
+    Steps 2-3 of the pipeline: search vector, safe + ranked dishes.
+    Returns (ranked dishes, user context, degraded); degraded means a fallback changed the
+    ranking (mood embedding or vector sort failed), so the answer must not be cached.
+    """
     # 2. Determine Search Vector
     search_vector = None
     user_context_str = ""
+    degraded = False
     
+    taste_vector = user.taste_vector
+
     if request.mood:
         print(f"Generating embedding for mood: {request.mood}")
-        search_vector = get_gemini_embedding(request.mood)
+        search_vector = await _mood_vector(request.mood)
         user_context_str = request.mood
-    elif user.taste_embedding is not None:
-        search_vector = user.taste_embedding
-        user_context_str = "Standard constraints and spicy tolerance."
-    else:
-        user_context_str = "No specific profile."
-    
-    # 3. Query Dishes (REMOVED is_available check to avoid NULL issues)
-    query = db.query(Dish).filter(Dish.restaurant_id == request.restaurant_id)
-    
-    all_dishes = query.all()
-    print(f"📊 Found {len(all_dishes)} dishes for restaurant {request.restaurant_id}")
-    
-    safe_candidates = []
-    user_strict_allergens = set(user.allergens_strict) if user.allergens_strict else set()
-    
-    for dish in all_dishes:
-        dish_allergens = set(dish.allergens) if dish.allergens else set()
-        if not dish_allergens.isdisjoint(user_strict_allergens):
-            continue
-        safe_candidates.append(dish)
+        degraded = search_vector is None
+    if search_vector is None and taste_vector is not None:
+        # No mood, or its embedding failed: rank by the taste profile
+        search_vector = taste_vector
+        user_context_str = user_context_str or "Standard constraints and spicy tolerance."
+    elif search_vector is None:
+        user_context_str = user_context_str or "No specific profile."
+        count_fallback("unranked")
+
+    allergens = list(user.allergens)
+    constraints = list(user.constraints)
+
+    # 3a. Snapshot ranker: vectorized filter + rank over the cached menu, no dish query
+    if RECOMMENDATION_RANKER == "snapshot":
+        with stage("candidate_query"):
+            snapshot = await snapshot_store.aget(db, request.restaurant_id)
+        with stage("safety_filter"):
+            mask = snapshot.safe_mask(allergens, constraints)
+            count_blocked(len(snapshot) - int(mask.sum()))
+        with stage("vector_rank"):
+            ranked = snapshot.rank(search_vector, allergens, constraints, limit=3, mask=mask)
+        ranked_dishes = [payload for payload, _ in ranked]
+        print(f"🏆 Ranked top {len(ranked_dishes)} dishes (snapshot v{snapshot.version})")
+        return ranked_dishes, user_context_str, degraded
+
+    # 3b. Safety Filter + Neural Ranking in one round trip (pgvector does the heavy lifting),
+    # so filter + rank are timed together as the candidate query. The blocked dish count
+    # rides along as a scalar subquery column
+    query = safe_dishes_query(
+        restaurant_id=request.restaurant_id,
+        allergens=allergens,
+        constraints=constraints,
+        search_vector=search_vector,
+        limit=3,
+        with_blocked=True,
+    )
+    try:
+        with stage("candidate_query"):
+            if search_vector is not None:
+                await aapply_search_settings(db, ef_search=ef_search_for(rerank_candidates(3)))
+            rows = (await db.execute(query)).all()
+            ranked_dishes = [row.Dish for row in rows]
+            if search_vector is not None and len(ranked_dishes) < 3:
+                # Dishes without a comparable vector follow the ranked ones, in menu order
+                ranked_dishes += (await db.execute(
+                    unranked_dishes_query(
+                        restaurant_id=request.restaurant_id,
+                        allergens=allergens,
+                        constraints=constraints,
+                        limit=3 - len(ranked_dishes),
+                    )
+                )).scalars().all()
+    except Exception as e:
+        print(f"⚠️ Vector Sort Error: {e}")
+        count_fallback("vector_sort")
+        degraded = True
+        await db.rollback()
+        with stage("candidate_query"):
+            rows = (await db.execute(
+                safe_dishes_query(
+                    restaurant_id=request.restaurant_id,
+                    allergens=allergens,
+                    constraints=constraints,
+                    limit=3,
+                    with_blocked=True,
+                )
+            )).all()
+            ranked_dishes = [row.Dish for row in rows]
 
-    print(f"✅ Safe candidates after allergy check: {len(safe_candidates)}")
+    if rows:
+        count_blocked(rows[0].blocked)
+    else:
+        # Nothing came back to carry the count: every dish may have been blocked
+        count_blocked(await db.scalar(select(blocked_count(request.restaurant_id, allergens, constraints))))
 
-    if not safe_candidates:
+    if not ranked_dishes:
         print("⚠️ No safe dishes found.")
-        return []
+    else:
+        print(f"🏆 Ranked top {len(ranked_dishes)} dishes")
+    return ranked_dishes, user_context_str, degraded
 
-    # 4. Neural Ranking
-    ranked_dishes = []
-    
-    if search_vector is not None:
-        try:
-            safe_ids = [d.id for d in safe_candidates]
-            # Query DB again to let pgvector do the heavy lifting
-            ranked_dishes = db.query(Dish).filter(
-                Dish.id.in_(safe_ids)
-            ).order_by(
-                Dish.embedding.l2_distance(search_vector)
-            ).limit(3).all()
-        except Exception as e:
-            print(f"⚠️ Vector Sort Error: {e}")
-            ranked_dishes = safe_candidates[:3]
+def _explanation_budget_seconds(request: RecommendationRequest) -> float:
+    budget_ms = request.explanation_budget_ms if request.explanation_budget_ms is not None else EXPLANATION_BUDGET_MS
+    return budget_ms / 1000
+
+# Serialized in the handler (inside the "serialization" stage) instead of by FastAPI afterwards:
+# one pre-built pydantic-core serializer per response shape writes the JSON bytes directly,
+# skipping FastAPI's response_model re-validation and its stdlib json.dumps pass
+_meal_bundles_json = TypeAdapter(List[MealBundle])
+_batch_results_json = TypeAdapter(List[BatchRecommendationResult])
+_search_results_json = TypeAdapter(List[RestaurantSearchResult])
+
+# Result Cache (a diner browsing re-opens the same menu with the same mood), see ResultCache
+result_cache = ResultCache(
+    provider_id(), EXPLANATION_MODEL,
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "600")),
+)
+
+async def _menu_version(db: AsyncSession, restaurant_id: str) -> Optional[int]:
+    return (await db.execute(select(Restaurant.menu_version).where(Restaurant.id == restaurant_id))).scalar()
+
+def _json_response(body: bytes, etag: Optional[str] = None) -> Response:
+    return Response(body, media_type="application/json", headers={"ETag": etag} if etag else None)
+
+@app.post("/api/v1/recommendations", response_model=List[MealBundle])
+async def generate_recommendations(
+    request: RecommendationRequest, 
+    db: AsyncSession = Depends(get_async_read_db),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    Answers repeat views from the result cache: the ETag names (profile version, menu
+    version, mood), so a client sending it back in If-None-Match gets a bodiless 304 when
+    neither the diner's profile nor the menu changed. Degraded answers (fallback ranking,
+    template explanations) carry no ETag and are never cached.
+    """
+    print(f"🚀 Processing Request for User: {request.user_id}")
+
+    # 1. Fetch User, then the cache key (profile version + menu version + mood)
+    user = await _get_user(db, request.user_id)
+    with stage("result_cache"):
+        menu_version = await _menu_version(db, request.restaurant_id)
+        key = result_cache.key_for(user.id, user.version, request.restaurant_id, menu_version, request.mood)
+        etag = result_cache.etag(key)
+        if etag_matches(if_none_match, etag):
+            result_cache.not_modified += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        cached = result_cache.get(key)
+    if cached is not None:
+        return _json_response(cached, etag)
+
+    ranked_dishes, user_context_str, degraded = await _rank_for_request(request, db, user)
+    if not ranked_dishes:
+        if degraded:
+            return _json_response(b"[]")
+        result_cache.set(key, b"[]")
+        return _json_response(b"[]", etag)
+
+    # 4. Generate Bundles, every bundle explained concurrently under one deadline
+    bundle_specs = _bundle_specs(ranked_dishes)
+    explanations = [fallback for _, _, fallback in bundle_specs]
+    with stage("explanation"):
+        async for i, explanation, is_fallback in iter_explanations_within_budget(
+            [dish for _, dish, _ in bundle_specs],
+            list(explanations),
+            user_context_str,
+            _explanation_budget_seconds(request),
+        ):
+            explanations[i] = explanation
+            degraded = degraded or is_fallback
+
+    with stage("serialization"):
+        body = _meal_bundles_json.dump_json(_build_bundles(bundle_specs, explanations))
+    if degraded:
+        return _json_response(body)
+    result_cache.set(key, body)
+    return _json_response(body, etag)
+
+@app.post("/api/v1/recommendations/stream")
+async def stream_recommendations(
+    request: RecommendationRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Streaming variant of /recommendations.
+      1. `bundles` event as soon as pgvector returns (explanations hold the template text)
+      2. one `explanation` event per bundle as each LLM call completes (or misses the budget)
+      3. `done`
+    NDJSON by default, Server-Sent Events when the client sends Accept: text/event-stream.
+    All DB work happens before the response starts, so no session is held while streaming.
+    """
+    print(f"🚀 Processing Streaming Request for User: {request.user_id}")
+
+    user = await _get_user(db, request.user_id)
+    ranked_dishes, user_context_str, _ = await _rank_for_request(request, db, user)
+    bundle_specs = _bundle_specs(ranked_dishes) if ranked_dishes else []
+    bundles = [
+        MealBundle(
+            title=title,
+            dishes=[DishResponse.model_validate(dish)],
+            total_price=dish.price,
+            explanation=fallback
+        ).model_dump()
+        for title, dish, fallback in bundle_specs
+    ]
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    def encode(event: dict) -> str:
+        if use_sse:
+            return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + "\n"
+
+    async def events():
+        yield encode({"event": "bundles", "data": bundles})
+        async for i, explanation, is_fallback in iter_explanations_within_budget(
+            [dish for _, dish, _ in bundle_specs],
+            [fallback for _, _, fallback in bundle_specs],
+            user_context_str,
+            _explanation_budget_seconds(request),
+        ):
+            yield encode({"event": "explanation", "index": i, "explanation": explanation, "fallback": is_fallback})
+        yield encode({"event": "done"})
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.post("/api/v1/recommendations/batch", response_model=List[BatchRecommendationResult])
+async def batch_recommendations(
+    request: BatchRecommendationRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Recommendations for every (user, restaurant) pair in one call: users and menus are
+    loaded once, and each restaurant scores all its (user, dish) pairs in one matrix product.
+    """
+    user_ids = list(dict.fromkeys(request.user_ids))
+    restaurant_ids = list(dict.fromkeys(request.restaurant_ids))
+    print(f"🚀 Processing Batch Request: {len(user_ids)} user(s) x {len(restaurant_ids)} restaurant(s)")
+
+    # 1. Fetch all Users in one query
+    with stage("user_fetch"):
+        users_by_id = await _get_users(db, user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in users_by_id]
+    if missing:
+        print(f"❌ Users not found in DB: {missing}")
+        raise HTTPException(status_code=404, detail=f"Users not found: {', '.join(missing)}")
+    users = [users_by_id[user_id] for user_id in user_ids]
+
+    # 2. Determine Search Vectors (one shared mood embedding, or each user's taste profile)
+    mood_vector = await _mood_vector(request.mood) if request.mood else None
+    if mood_vector is not None:
+        search_vectors = [mood_vector] * len(users)
+        contexts = [request.mood] * len(users)
     else:
-        ranked_dishes = safe_candidates[:3]
+        search_vectors = [user.taste_vector for user in users]
+        contexts = [
+            "Standard constraints and spicy tolerance." if vector is not None else "No specific profile."
+            for vector in search_vectors
+        ]
 
-    print(f"🏆 Ranked top {len(ranked_dishes)} dishes")
+    # 3. Safety rules per user, or the union of everyone's for a shared table
+    if request.shared_table:
+        allergens = sorted(set().union(*(user.allergens for user in users)))
+        constraints = sorted(set().union(*(user.constraints for user in users)))
+        rules = [(allergens, constraints)] * len(users)
+    else:
+        rules = [(user.allergens, user.constraints) for user in users]
+    count_fallback("unranked", sum(vector is None for vector in search_vectors))
 
-    # 5. Generate Bundles with Explanation
-    bundles = []
-    if ranked_dishes:
-        top_dish = ranked_dishes[0]
-        
-        explanation = generate_explanation(top_dish.name, top_dish.description or "", user_context_str)
-        
-        bundles.append(MealBundle(
-            title="Top Match",
-            dishes=[DishResponse.model_validate(top_dish)],
-            total_price=top_dish.price,
-            explanation=explanation
+    # 4. Rank every (user, dish) pair per restaurant in one matrix op over the menu snapshot
+    ranked = {}
+    for restaurant_id in restaurant_ids:
+        with stage("candidate_query"):
+            snapshot = await snapshot_store.aget(db, restaurant_id)
+        with stage("safety_filter"):
+            masks = np.stack([snapshot.safe_mask(a, c) for a, c in rules])
+            count_blocked(masks.size - int(masks.sum()))
+        with stage("vector_rank"):
+            rank_results = snapshot.rank_many(search_vectors, masks, limit=3)
+        for user, results in zip(users, rank_results):
+            ranked[(user.id, restaurant_id)] = [payload for payload, _ in results]
+
+    # 5. Explanations for every bundle, concurrently, under one deadline.
+    # Grouped by context and de-duplicated by dish, so a table sharing a mood pays once per dish.
+    specs = {key: _bundle_specs(dishes) for key, dishes in ranked.items() if dishes}
+    context_by_user = dict(zip(user_ids, contexts))
+    groups = {}
+    for (user_id, _), bundle_specs in specs.items():
+        group = groups.setdefault(context_by_user[user_id], {})
+        for _, dish, fallback in bundle_specs:
+            group.setdefault(dish.id, (dish, fallback))
+
+    budget_seconds = _explanation_budget_seconds(request)
+    group_contexts = list(groups)
+    with stage("explanation"):
+        group_results = await asyncio.gather(*(
+            explain_within_budget(
+                [dish for dish, _ in groups[context].values()],
+                [fallback for _, fallback in groups[context].values()],
+                context,
+                budget_seconds,
+            )
+            for context in group_contexts
         ))
-        
-        if len(ranked_dishes) > 1:
-            second = ranked_dishes[1]
-            bundles.append(MealBundle(
-                title="Alternative Choice",
-                dishes=[DishResponse.model_validate(second)],
-                total_price=second.price,
-                explanation=f"A close second: {second.name}."
-            ))
+    explained = {
+        (context, dish_id): explanation
+        for context, explanations in zip(group_contexts, group_results)
+        for dish_id, explanation in zip(groups[context], explanations)
+    }
 
-    return bundles
+    with stage("serialization"):
+        results = []
+        for user_id in user_ids:
+            for restaurant_id in restaurant_ids:
+                bundle_specs = specs.get((user_id, restaurant_id), [])
+                explanations = [explained[(context_by_user[user_id], dish.id)] for _, dish, _ in bundle_specs]
+                results.append(BatchRecommendationResult(
+                    user_id=user_id,
+                    restaurant_id=restaurant_id,
+                    bundles=_build_bundles(bundle_specs, explanations),
+                ))
+        body = _batch_results_json.dump_json(results)
+    return _json_response(body)
+
+# Global search: phase-1 pool = max_restaurants * per_restaurant * factor nearest safe dishes
+SEARCH_POOL_FACTOR = int(os.getenv("SEARCH_POOL_FACTOR", "4"))
+SEARCH_POOL_MAX = int(os.getenv("SEARCH_POOL_MAX", "1000"))
+
+@app.post("/api/v1/search", response_model=List[RestaurantSearchResult])
+async def search_dishes(
+    request: SearchRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Ranks safe dishes across every restaurant for a mood (or the user's taste profile),
+    at most `per_restaurant` per restaurant, grouped by restaurant (best match first).
+    """
+    print(f"🔎 Processing Search for User: {request.user_id}")
+
+    # 1. Fetch User
+    user = await _get_user(db, request.user_id)
+
+    # 2. Determine Search Vector
+    taste_vector = user.taste_vector
+    if request.mood:
+        try:
+            with stage("embedding"):
+                search_vector = await aget_embedding(request.mood)
+        except EmbeddingUnavailable as e:
+            # Search has no unranked mode: a wrong ranking would look like a real one
+            print(f"⚠️ Embedding Error: {e}")
+            raise HTTPException(status_code=503, detail="Embedding provider unavailable")
+    elif taste_vector is not None:
+        search_vector = taste_vector
+    else:
+        raise HTTPException(status_code=400, detail="Provide a mood or complete onboarding first")
+
+    # 3. Retrieve a small candidate pool via the ANN index, then cap per restaurant
+    pool = min(request.max_restaurants * request.per_restaurant * SEARCH_POOL_FACTOR, SEARCH_POOL_MAX)
+    query = diversified_search_query(
+        search_vector,
+        allergens=list(user.allergens),
+        constraints=list(user.constraints),
+        per_restaurant=request.per_restaurant,
+        pool=pool,
+    )
+    # The WHERE clause filters ANN results, so the graph search must surface the whole pool
+    with stage("candidate_query"):
+        await aapply_search_settings(db, ef_search=ef_search_for(rerank_candidates(pool)))
+        rows = (await db.execute(query)).all()
+
+    # 4. Group by restaurant, ordered by each restaurant's best match
+    with stage("serialization"):
+        results = {}
+        for dish, restaurant, distance in rows:
+            if restaurant.id not in results:
+                if len(results) >= request.max_restaurants:
+                    continue
+                results[restaurant.id] = RestaurantSearchResult(
+                    restaurant_id=restaurant.id,
+                    restaurant_name=restaurant.name,
+                    address=restaurant.address,
+                    dishes=[],
+                )
+            results[restaurant.id].dishes.append(
+                DishSearchHit(dish=DishResponse.model_validate(dish), distance=distance)
+            )
+        body = _search_results_json.dump_json(list(results.values()))
+
+    print(f"🏆 {len(rows)} dishes from {len(results)} restaurants (pool {pool})")
+    return _json_response(body)
 
 @app.post("/api/v1/users", response_model=dict)
-def create_user(
+async def create_user(
     request: UserOnboardingRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)  # Writes: always the primary
 ):
     # 1. Supabase Auth Sign Up
     supabase_user_id = None
-    if supabase:
+    auth_client = await get_async_supabase()
+    if auth_client:
         try:
             print(f"🔐 Registering user {request.email} in Supabase Auth...")
-            auth_response = supabase.auth.sign_up({
+            auth_response = await auth_client.auth.sign_up({
                 "email": request.email,
                 "password": request.password
             })
@@ -239,8 +754,14 @@ def create_user(
 
     # 2. Generate Embedding from Preferences
     print(f"Generating profile for {request.name} based on: {request.preferences}")
-    preference_embedding = get_gemini_embedding(request.preferences)
-    
+    # No vector beats a fake one: the profile stays unranked until re-embedded
+    provider = get_provider()
+    try:
+        preference_embedding = await provider.aembed(request.preferences)
+    except EmbeddingUnavailable as e:
+        print(f"⚠️ Embedding Error, profile saved without a taste vector: {e}")
+        preference_embedding = None
+
     # 3. Create User Record in Postgres
     new_user = User(
         id=supabase_user_id, # Link UUIDs
@@ -251,21 +772,43 @@ def create_user(
         allergens_strict=request.allergens,
         spice_tolerance=3, # Default
         budget_setting=2, # Default
-        taste_embedding=preference_embedding
+        taste_embedding=preference_embedding,
+        embedding_provider=provider.id if preference_embedding is not None else None,
+        embedding_dim=len(preference_embedding) if preference_embedding is not None else None,
     )
     
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        # Write-through: the first recommendation skips the user query (and replica lag)
+        profile_store.put(UserProfile(new_user))
         return {"user_id": new_user.id}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error creating user DB record: {e}")
         # If DB fails, we technically have an orphaned Auth user. 
         # In prod, we'd delete the auth user too to maintain consistency.
         raise HTTPException(status_code=500, detail="Failed to create user profile")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms + blocked dish / fallback counters (Prometheus text format)."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "caches": {
+            "mood_embedding": mood_embedding_cache.stats(),
+            "explanation": explanation_cache.stats(),
+            "recommendation_results": result_cache.stats(),
+        },
+        "menu_snapshots": snapshot_store.stats(),
+        "user_profiles": profile_store.stats(),
+        "embedding_provider": provider_id(),
+        "background_explanations": {"running": len(_background_tasks), "max": EXPLANATION_BACKGROUND_MAX},
+        "database": database_status(),
+    }
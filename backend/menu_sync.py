@@ -0,0 +1,73 @@
+import uuid
+from typing import Dict, Iterable, Optional, Sequence
+
+from psycopg2.extras import execute_values
+
+from backend.cache import cache_key
+from backend.bulk import DISH_COPY_COLUMNS, copy_dishes, bump_menu_versions
+from backend.gemini import ENRICHMENT_MODEL
+from backend.embeddings import provider_id
+
+# Incremental re-seeding: dishes get deterministic ids and a hash of everything that feeds
+# enrichment / embedding, so a re-seed only pays Gemini for dishes whose inputs changed.
+DISH_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "curate/dishes")
+
+def stable_id(*parts: str) -> str:
+    """Same restaurant / grouping / name -> same id on every run (upsert key)."""
+    return str(uuid.uuid5(DISH_ID_NAMESPACE, "\x1f".join(part or "" for part in parts)))
+
+def content_hash(*inputs: Optional[str]) -> str:
+    """
+    Hash of the LLM inputs (never price). The embedding provider and model names are
+    included so switching either re-embeds everything once.
+    """
+    return cache_key(provider_id(), ENRICHMENT_MODEL, *(value or "" for value in inputs))
+
+def existing_content_hashes(cursor, restaurant_id: str) -> Dict[str, Optional[str]]:
+    """id -> content_hash for every dish of the restaurant, soft-deleted ones included."""
+    cursor.execute("SELECT id, content_hash FROM dishes WHERE restaurant_id = %s", (restaurant_id,))
+    return dict(cursor.fetchall())
+
+def upsert_dishes(cursor, rows: Sequence[Dict]) -> int:
+    """
+    Insert-or-replace full dish rows (changed content): COPY into a temp staging table,
+    then one INSERT ... ON CONFLICT (id) DO UPDATE. Revives soft-deleted rows.
+    """
+    if not rows:
+        return 0
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS dishes_stage (LIKE dishes INCLUDING DEFAULTS) ON COMMIT DROP")
+    cursor.execute("TRUNCATE dishes_stage")
+    copy_dishes(cursor, rows, table="dishes_stage")
+
+    columns = [column for column, _ in DISH_COPY_COLUMNS]
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != "id")
+    cursor.execute(
+        f"INSERT INTO dishes ({', '.join(columns)}) SELECT {', '.join(columns)} FROM dishes_stage "
+        f"ON CONFLICT (id) DO UPDATE SET {updates}, deleted_at = NULL"
+    )
+    return cursor.rowcount
+
+def update_prices(cursor, prices: Dict[str, float]) -> int:
+    """Unchanged content: only price / soft-delete state can differ. Touches rows that actually change."""
+    if not prices:
+        return 0
+    execute_values(
+        cursor,
+        """
+        UPDATE dishes SET price = v.price, deleted_at = NULL
+        FROM (VALUES %s) AS v(id, price)
+        WHERE dishes.id = v.id AND (dishes.price IS DISTINCT FROM v.price OR dishes.deleted_at IS NOT NULL)
+        """,
+        list(prices.items()),
+        template="(%s, %s::double precision)",
+    )
+    return cursor.rowcount
+
+def soft_delete_missing(cursor, restaurant_id: str, keep_ids: Iterable[str]) -> int:
+    """Dishes no longer on the source menu are hidden (deleted_at), not removed: ids stay stable."""
+    cursor.execute(
+        "UPDATE dishes SET deleted_at = now() "
+        "WHERE restaurant_id = %s AND deleted_at IS NULL AND NOT (id = ANY(%s))",
+        (restaurant_id, list(keep_ids)),
+    )
+    return cursor.rowcount
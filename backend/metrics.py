@@ -0,0 +1,160 @@
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Metrics Config
+# Registry is per worker process (like the pool stats on /health): scrape every worker,
+# or run one worker per container.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Server-Timing response header with the per-stage durations (browser devtools, curl -v)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds: sub-millisecond numpy work up to multi-second LLM calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic counter per label combination (Prometheus text format)."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0)
+
+    def lines(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {value:g}"
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination (Prometheus text format)."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = Lock()
+        # key -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def lines(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+REGISTRY: List = []
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.lines())
+    return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = Histogram(
+    "curate_stage_seconds", "Time spent in each pipeline stage of a request", ("endpoint", "stage"),
+)
+REQUEST_SECONDS = Histogram(
+    "curate_request_seconds", "Handler time until the response starts", ("endpoint", "status"),
+)
+DISHES_BLOCKED = Counter(
+    "curate_dishes_blocked_total", "Dishes removed by the safety filter (allergens, constraints, availability)",
+)
+FALLBACKS = Counter(
+    "curate_fallbacks_total", "Degraded answers served, by kind", ("kind",),
+)
+
+class StageTimer:
+    """Stage durations of one request, reported as Server-Timing and into STAGE_SECONDS."""
+    def __init__(self):
+        self.stages: Dict[str, float] = {}  # insertion order = pipeline order
+        self.started = time.perf_counter()
+
+    def record(self, name: str, seconds: float):
+        # A stage run twice (e.g. the retry after a vector sort error) adds up
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def finish(self, endpoint: str, status: int) -> float:
+        total = time.perf_counter() - self.started
+        if METRICS_ENABLED:
+            for name, seconds in self.stages.items():
+                STAGE_SECONDS.observe(seconds, endpoint=endpoint, stage=name)
+            REQUEST_SECONDS.observe(total, endpoint=endpoint, status=str(status))
+        return total
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar("curate_stage_timer", default=None)
+
+def start_request() -> StageTimer:
+    """Binds a fresh StageTimer to the current request context (called by the middleware)."""
+    timer = StageTimer()
+    _current_timer.set(timer)
+    return timer
+
+@contextmanager
+def stage(name: str):
+    """Times the block as `name` on the current request (no-op outside a request)."""
+    timer = _current_timer.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            timer.record(name, time.perf_counter() - started)
+
+def count_fallback(kind: str, amount: int = 1):
+    if METRICS_ENABLED and amount:
+        FALLBACKS.inc(amount, kind=kind)
+
+def count_blocked(amount: int):
+    if METRICS_ENABLED and amount:
+        DISHES_BLOCKED.inc(amount)
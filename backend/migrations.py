@@ -0,0 +1,29 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend import bitmask, embeddings, profiles, vectors
+
+# create_all() only creates missing tables, it never adds columns to existing ones.
+# Columns added after a table first shipped are patched in here. Every statement must be
+# idempotent: this runs on every startup, after create_all().
+SCHEMA_PATCHES = [
+    # Menu snapshot invalidation: bumped whenever any dish of the restaurant changes
+    "ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS menu_version INTEGER NOT NULL DEFAULT 0",
+    # Incremental re-seeding: content hash + soft delete
+    "ALTER TABLE dishes ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE dishes ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITHOUT TIME ZONE",
+    # Allergen / dietary bitmasks (+ backfill and sync triggers)
+    *bitmask.schema_patches(),
+    # Write-time normalization + compact retrieval column (VECTOR_DISTANCE / VECTOR_COMPACT)
+    *vectors.schema_patches(),
+    # Provider / dimension next to every vector (legacy rows labelled as Gemini)
+    *embeddings.schema_patches(),
+    # User profile cache invalidation: profile_version + the trigger that bumps it
+    *profiles.schema_patches(),
+]
+
+def apply_schema_patches(engine: Engine):
+    with engine.begin() as connection:
+        vectors.check_pgvector(connection)
+        for statement in SCHEMA_PATCHES:
+            connection.execute(text(statement))
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON, Boolean, Text
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, JSON, Boolean, Text, DateTime, event, update
+from sqlalchemy.orm import relationship, declarative_base, Session
 from sqlalchemy.dialects.postgresql import ARRAY
 from pgvector.sqlalchemy import Vector
+from datetime import datetime
+
+from backend.bitmask import ALLERGEN_BITS, CONSTRAINT_BITS, mask_or_none
 
 Base = declarative_base()
 
@@ -18,9 +21,13 @@ class User(Base):
     allergens_strict = Column(ARRAY(String), default=[])  # e.g. ["peanuts", "shellfish"]
     spice_tolerance = Column(Integer, default=0)  # 0-5
     budget_setting = Column(Integer, default=2)  # 1: Cheap, 2: Moderate, 3: Expensive
+    profile_version = Column(Integer, nullable=False, default=0, server_default="0") # Bumped by DB trigger on any profile change (profile cache invalidation)
     
     # Vector Embedding for Taste
     taste_embedding = Column(Vector(768))  # Dimensions for Gemini text-embedding-004
+    # Which provider made the vector ('gemini:text-embedding-004', 'local:...'), see backend.embeddings
+    embedding_provider = Column(String(128))
+    embedding_dim = Column(Integer)
 
 class Restaurant(Base):
     __tablename__ = 'restaurants'
@@ -29,6 +36,7 @@ class Restaurant(Base):
     name = Column(String, nullable=False)
     address = Column(String)
     owner_id = Column(String, nullable=False) # Link to auth user who owns this
+    menu_version = Column(Integer, nullable=False, default=0, server_default="0") # Bumped on any Dish change (snapshot invalidation)
     
     dishes = relationship("Dish", back_populates="restaurant")
 
@@ -45,6 +53,9 @@ class Dish(Base):
     ingredients = Column(ARRAY(String), default=[])
     allergens = Column(ARRAY(String), default=[]) # e.g. ["peanuts", "milk"]
     tags = Column(ARRAY(String), default=[]) # e.g. ["spicy", "comfort_food"]
+    # Bitmask mirrors of allergens / tags (backend.bitmask), kept in sync by DB trigger
+    allergen_mask = Column(BigInteger)
+    tag_mask = Column(BigInteger)
     
     calories = Column(Integer)
     spice_level = Column(Integer) # 0-5
@@ -52,5 +63,56 @@ class Dish(Base):
     
     # Vector Embedding for Dish
     embedding = Column(Vector(768))
+    embedding_provider = Column(String(128))  # backend.embeddings.provider_id() of the vector
+    embedding_dim = Column(Integer)
+
+    # Incremental re-seeding (backend.menu_sync): hash of the enrichment / embedding inputs,
+    # and soft delete for dishes that left the source menu (hidden from every query)
+    content_hash = Column(String(64))
+    deleted_at = Column(DateTime)
     
     restaurant = relationship("Restaurant", back_populates="dishes")
+
+@event.listens_for(Dish, "before_insert")
+@event.listens_for(Dish, "before_update")
+def _sync_dish_masks(mapper, connection, target):
+    # The DB trigger is authoritative; this keeps the in-memory object consistent too
+    target.allergen_mask = mask_or_none(target.allergens, ALLERGEN_BITS)
+    target.tag_mask = mask_or_none(target.tags, CONSTRAINT_BITS)
+
+@event.listens_for(Session, "after_flush")
+def _bump_menu_versions(session, flush_context):
+    """Any insert/update/delete of a Dish through the ORM bumps its restaurant's menu_version."""
+    # session.dirty also lists objects whose attributes were set to the same value (e.g. merge)
+    changed = [obj for obj in session.dirty if session.is_modified(obj)]
+    restaurant_ids = {
+        obj.restaurant_id
+        for obj in (*session.new, *changed, *session.deleted)
+        if isinstance(obj, Dish) and obj.restaurant_id
+    }
+    if restaurant_ids:
+        session.execute(
+            update(Restaurant)
+            .where(Restaurant.id.in_(restaurant_ids))
+            .values(menu_version=Restaurant.menu_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = 'embedding_cache'
+
+    key = Column(String(64), primary_key=True) # sha256(model, normalized text)
+    model = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    embedding = Column(Vector(768), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ExplanationCacheEntry(Base):
+    __tablename__ = 'explanation_cache'
+
+    key = Column(String(64), primary_key=True) # sha256(model, dish id, dish version, normalized context)
+    dish_id = Column(String, nullable=False, index=True)
+    dish_version = Column(String, nullable=False)
+    context = Column(Text, nullable=False)
+    explanation = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
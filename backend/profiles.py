@@ -0,0 +1,146 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import User
+from backend.cache import LRUCache
+from backend.embeddings import usable
+
+# Profile Cache Config
+# Per worker process, like the menu snapshots. Writes through the ORM in this process
+# invalidate at once; other workers and raw SQL writers are picked up after the TTL.
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+USER_PROFILE_CACHE_TTL_SECONDS = float(os.getenv("USER_PROFILE_CACHE_TTL_SECONDS", "30"))
+
+# Columns the request path reads: everything else on users (email, password, ...) stays in Postgres
+PROFILE_COLUMNS = (
+    User.id, User.profile_version, User.allergens_strict, User.constraints,
+    User.spice_tolerance, User.budget_setting, User.taste_embedding, User.embedding_provider,
+)
+
+# Trigger body: any change to a column the profile is built from bumps the version
+_PROFILE_SOURCE_COLUMNS = (
+    "allergens_strict", "constraints", "spice_tolerance", "budget_setting",
+    "taste_embedding", "embedding_provider",
+)
+
+def _labels(values: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    return tuple(sorted(set(values or [])))
+
+class UserProfile:
+    """
+    Compact, read-only copy of what ranking needs from a User (from a PROFILE_COLUMNS row
+    or a User object): de-duplicated allergen / constraint tuples, and the taste vector as
+    float32, or None when missing or embedded by another provider.
+    """
+    __slots__ = ("id", "version", "allergens", "constraints", "spice_tolerance", "budget_setting", "taste_vector")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.version = row.profile_version or 0
+        self.allergens = _labels(row.allergens_strict)
+        self.constraints = _labels(row.constraints)
+        self.spice_tolerance = row.spice_tolerance
+        self.budget_setting = row.budget_setting
+        vector = usable(row.taste_embedding, row.embedding_provider)
+        self.taste_vector = np.asarray(vector, dtype=np.float32) if vector is not None else None
+
+def _profiles_query(user_ids: Sequence[str]):
+    return select(*PROFILE_COLUMNS).where(User.id.in_(user_ids))
+
+class ProfileStore:
+    """
+    Bounded LRU of UserProfiles keyed by user id, so repeat requests from the same diner
+    skip the user query entirely. Ids that aren't in the database are never cached.
+    """
+    def __init__(self, maxsize: int = USER_PROFILE_CACHE_SIZE, ttl_seconds: float = USER_PROFILE_CACHE_TTL_SECONDS):
+        self.memory = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def _cached(self, user_ids: Sequence[str]) -> Tuple[Dict[str, UserProfile], List[str]]:
+        found, missing = {}, []
+        for user_id in dict.fromkeys(user_ids):
+            profile = self.memory.get(user_id)
+            if profile is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = profile
+        self.hits += len(found)
+        return found, missing
+
+    def _store(self, rows) -> Dict[str, UserProfile]:
+        profiles = {row.id: UserProfile(row) for row in rows}
+        for profile in profiles.values():
+            self.put(profile)
+        return profiles
+
+    def put(self, profile: UserProfile):
+        """Write-through: writers hand over the profile they just committed."""
+        self.memory.set(profile.id, profile)
+        self.loads += 1
+
+    def invalidate(self, user_id: Optional[str] = None):
+        if user_id is None:
+            self.memory.clear()
+        else:
+            self.memory.delete(user_id)
+        self.invalidations += 1
+
+    def get_many(self, db: Session, user_ids: Sequence[str]) -> Dict[str, UserProfile]:
+        """id -> UserProfile for the ids that exist (cached ones without a query)."""
+        profiles, missing = self._cached(user_ids)
+        if missing:
+            profiles.update(self._store(db.execute(_profiles_query(missing)).all()))
+        return profiles
+
+    async def aget_many(self, db: AsyncSession, user_ids: Sequence[str]) -> Dict[str, UserProfile]:
+        profiles, missing = self._cached(user_ids)
+        if missing:
+            profiles.update(self._store((await db.execute(_profiles_query(missing))).all()))
+        return profiles
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.memory),
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+# Shared per-process store
+profile_store = ProfileStore()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_profile(mapper, connection, target):
+    """Any ORM update/delete of a User drops its cached profile (future profile endpoints included)."""
+    profile_store.invalidate(target.id)
+
+def schema_patches() -> List[str]:
+    """
+    Idempotent DDL for backend.migrations: users.profile_version, and a BEFORE UPDATE
+    trigger that bumps it whenever a profile column changes, so raw SQL writers (seeders,
+    manual fixes) produce a new version too.
+    """
+    changed = " OR ".join(f"NEW.{column} IS DISTINCT FROM OLD.{column}" for column in _PROFILE_SOURCE_COLUMNS)
+    return [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_version INTEGER NOT NULL DEFAULT 0",
+        f"""
+CREATE OR REPLACE FUNCTION users_bump_profile_version() RETURNS trigger AS $$
+BEGIN
+    IF {changed} THEN
+        NEW.profile_version := OLD.profile_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS users_bump_profile_version ON users",
+        "CREATE TRIGGER users_bump_profile_version BEFORE UPDATE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION users_bump_profile_version()",
+    ]
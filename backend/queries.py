@@ -0,0 +1,220 @@
+from sqlalchemy import and_, select, func, not_, or_
+from sqlalchemy.orm import load_only
+from sqlalchemy.sql import ColumnElement, Select
+from typing import List, Optional
+
+from backend.models import Dish, Restaurant
+from backend import vectors
+from backend.embeddings import provider_id
+from backend.indexes import VECTOR_INDEX_SCOPE
+from backend.bitmask import (
+    all_known_allergens, all_known_constraints, encode_allergens, encode_constraints,
+)
+
+# Everything DishResponse returns. Ranking queries load only these: the 768-float vectors,
+# compact column and content hash never leave Postgres (accessing them raises instead of
+# lazy loading, which an async session couldn't do anyway)
+DISH_RESPONSE_COLUMNS = (
+    Dish.id, Dish.restaurant_id, Dish.name, Dish.description, Dish.price, Dish.ingredients,
+    Dish.allergens, Dish.tags, Dish.calories, Dish.spice_level, Dish.is_available,
+)
+
+def _response_fields_only():
+    return load_only(*DISH_RESPONSE_COLUMNS, raiseload=True)
+
+def safety_filters(
+    allergens: Optional[List[str]] = None,
+    constraints: Optional[List[str]] = None,
+) -> List[ColumnElement]:
+    """WHERE clauses every dish must pass before it can be ranked or returned."""
+    # NULL is treated as available (legacy rows were seeded without it); soft-deleted dishes never surface
+    clauses = [Dish.is_available.isnot(False), Dish.deleted_at.is_(None)]
+
+    # NULL dish allergens mean "unknown", never "none": for a user with any allergen both
+    # predicates evaluate to NULL and the dish is excluded (fail closed, like the snapshot)
+    if allergens:
+        if all_known_allergens(allergens):
+            # Single bitwise op: (dish mask & user mask) = 0. NULL mask -> excluded.
+            clauses.append(Dish.allergen_mask.op("&")(encode_allergens(allergens)) == 0)
+        else:
+            # Free-text allergen outside AllergenEnum has no bit: fall back to array overlap
+            clauses.append(not_(Dish.allergens.overlap(list(allergens))))
+
+    if constraints:
+        # If user wants Vegan, dish MUST be tagged Vegan (all constraints must be present)
+        if all_known_constraints(constraints):
+            constraint_mask = encode_constraints(constraints)
+            clauses.append(Dish.tag_mask.op("&")(constraint_mask) == constraint_mask)
+        else:
+            clauses.append(Dish.tags.contains(list(constraints)))
+
+    return clauses
+
+def comparable_filter() -> ColumnElement:
+    """Only vectors from the active embedding provider can be compared with a query vector."""
+    return and_(Dish.embedding.isnot(None), Dish.embedding_provider == provider_id())
+
+def safe_dishes_query(
+    restaurant_id: str,
+    allergens: Optional[List[str]] = None,
+    constraints: Optional[List[str]] = None,
+    search_vector: Optional[List[float]] = None,
+    limit: Optional[int] = None,
+    with_distance: bool = False,
+    with_blocked: bool = False,
+) -> Select:
+    """
+    HARD GUARDRAIL + SEMANTIC RANK in a single SQL statement.
+    Shared by the API endpoint and RecommendationEngine so both apply the same rules:
+      1. Allergen exclusion: dish.allergens && user allergens must be empty
+         (bitmask AND when every allergen has a bit, array overlap otherwise).
+      2. Dietary constraints: dish.tags @> user constraints (bitmask / containment).
+      3. Availability: NULL is treated as available (legacy rows were seeded without it),
+         soft-deleted dishes are excluded.
+      4. Ordering by distance to the search vector, with LIMIT, done by pgvector.
+         VECTOR_INDEX_SCOPE=restaurant: exact distances over the restaurant's rows (btree
+         on restaurant_id), never an ANN scan that could stop short of LIMIT.
+         VECTOR_INDEX_SCOPE=global: the ANN index serves the ORDER BY; with VECTOR_COMPACT
+         the nearest limit * VECTOR_RERANK_FACTOR are first taken by compact distance,
+         then re-ranked on the full vectors.
+         Either way the ranked (id, distance) rows are a MATERIALIZED CTE re-sorted by the
+         outer query, so an IVFFlat relaxed_order scan can't return them out of order.
+         Only dishes embedded by the active provider are ranked; callers list the rest
+         after them with unranked_dishes_query().
+    With with_distance (and a search vector) rows are (Dish, distance); with_blocked adds
+    a `blocked` column (see blocked_count) so the metric costs no extra round trip.
+    """
+    filters = [Dish.restaurant_id == restaurant_id, *safety_filters(allergens, constraints)]
+    if search_vector is not None:
+        filters.append(comparable_filter())
+    query = select(Dish).where(*filters)
+
+    if search_vector is not None:
+        distance = vectors.distance(Dish.embedding, search_vector)
+        ranked = select(Dish.id, distance.label("distance"))
+        if VECTOR_INDEX_SCOPE == "restaurant":
+            # Every safe dish of the menu gets its exact distance inside the CTE: the outer
+            # ORDER BY is on a CTE column, which no ANN index can serve
+            ranked = ranked.where(*filters)
+        else:
+            if vectors.compact_enabled() and limit is not None:
+                candidates = (
+                    select(Dish.id)
+                    .where(*filters)
+                    .order_by(vectors.compact_distance(search_vector))
+                    .limit(vectors.rerank_candidates(limit))
+                )
+                ranked = ranked.where(Dish.id.in_(candidates.scalar_subquery()))
+            else:
+                ranked = ranked.where(*filters)
+            ranked = ranked.order_by(distance)
+            if limit is not None:
+                ranked = ranked.limit(limit)
+        ranked = ranked.cte("ranked").prefix_with("MATERIALIZED")
+        query = select(Dish).join(ranked, ranked.c.id == Dish.id).order_by(ranked.c.distance, Dish.id)
+        if with_distance:
+            query = query.add_columns(ranked.c.distance)
+    if with_blocked:
+        query = query.add_columns(blocked_count(restaurant_id, allergens, constraints).label("blocked"))
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query.options(_response_fields_only())
+
+def blocked_count(
+    restaurant_id: str,
+    allergens: Optional[List[str]] = None,
+    constraints: Optional[List[str]] = None,
+) -> ColumnElement:
+    """
+    Scalar subquery: how many of the restaurant's (not deleted) dishes the safety filters
+    remove, the SQL twin of the snapshot's len(snapshot) - mask.sum(). A filter that
+    evaluates to NULL counts as blocked, as it does in the WHERE clause.
+    """
+    return (
+        select(func.count() - func.count().filter(and_(*safety_filters(allergens, constraints))))
+        .where(Dish.restaurant_id == restaurant_id, Dish.deleted_at.is_(None))
+        .correlate(None)
+        .scalar_subquery()
+    )
+
+def unranked_dishes_query(
+    restaurant_id: str,
+    allergens: Optional[List[str]] = None,
+    constraints: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> Select:
+    """
+    Safe dishes a ranked safe_dishes_query() leaves out: no vector, or one from another
+    embedding provider. Listed after the ranked dishes, in menu order.
+    """
+    query = (
+        select(Dish)
+        .where(
+            Dish.restaurant_id == restaurant_id,
+            *safety_filters(allergens, constraints),
+            or_(Dish.embedding.is_(None), Dish.embedding_provider.is_distinct_from(provider_id())),
+        )
+        .order_by(Dish.id)
+        .options(_response_fields_only())
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def diversified_search_query(
+    search_vector: List[float],
+    allergens: Optional[List[str]] = None,
+    constraints: Optional[List[str]] = None,
+    per_restaurant: int = 3,
+    pool: int = 200,
+) -> Select:
+    """
+    Catalogue-wide search in two phases, one statement:
+      1. Retrieve: the `pool` nearest safe dishes across every restaurant. A plain
+         ORDER BY distance LIMIT with no restaurant filter, so it is served by the
+         global ANN index instead of scanning the dishes table. With VECTOR_COMPACT,
+         pool * VECTOR_RERANK_FACTOR come off the compact index and the full vectors
+         pick the `pool` nearest of those.
+      2. Diversify: row_number() per restaurant over that small pool only, keeping
+         at most `per_restaurant` dishes from each.
+    Only dishes embedded by the active provider are comparable, the rest are skipped.
+    Yields (Dish, Restaurant, distance) rows, nearest first (Dish with the response
+    fields only).
+    """
+    distance = vectors.distance(Dish.embedding, search_vector)
+    candidates = (
+        select(Dish.id.label("dish_id"), Dish.restaurant_id, distance.label("distance"))
+        .where(
+            comparable_filter(),
+            *safety_filters(allergens, constraints),
+        )
+    )
+    if vectors.compact_enabled():
+        compact = (
+            candidates
+            .order_by(vectors.compact_distance(search_vector))
+            .limit(vectors.rerank_candidates(pool))
+            .subquery("compact_candidates")
+        )
+        candidates = select(compact).order_by(compact.c.distance)
+    else:
+        candidates = candidates.order_by(distance)
+    candidates = candidates.limit(pool).subquery("candidates")
+    ranked = select(
+        candidates,
+        func.row_number().over(
+            partition_by=candidates.c.restaurant_id,
+            order_by=candidates.c.distance,
+        ).label("restaurant_rank"),
+    ).subquery("ranked")
+
+    return (
+        select(Dish, Restaurant, ranked.c.distance)
+        .join(ranked, Dish.id == ranked.c.dish_id)
+        .join(Restaurant, Restaurant.id == Dish.restaurant_id)
+        .where(ranked.c.restaurant_rank <= per_restaurant)
+        .order_by(ranked.c.distance)
+        .options(_response_fields_only(), load_only(Restaurant.id, Restaurant.name, Restaurant.address, raiseload=True))
+    )
@@ -46,6 +46,11 @@ class DishCreate(DishBase):
 class DishResponse(DishBase):
     id: str
     restaurant_id: str
+
+    @validator("is_available", pre=True)
+    def null_means_available(cls, value):
+        # Legacy rows were seeded without is_available; the safety filter treats NULL as available
+        return True if value is None else value
     
     class Config:
         from_attributes = True
@@ -93,6 +98,39 @@ class RecommendationRequest(BaseModel):
     restaurant_id: str
     hunger_level: Optional[str] = None
     mood: Optional[str] = None
+    # Deadline (ms) for all LLM explanations of this request; server default when omitted
+    explanation_budget_ms: Optional[int] = Field(default=None, ge=0, le=30000)
+
+class BatchRecommendationRequest(BaseModel):
+    # Every (user, restaurant) pair is scored: a table of diners at one restaurant,
+    # or one diner across a shortlist of restaurants.
+    user_ids: List[str] = Field(min_length=1, max_length=50)
+    restaurant_ids: List[str] = Field(min_length=1, max_length=50)
+    mood: Optional[str] = None
+    # Shared dishes for the whole table: apply the union of everyone's allergens & constraints
+    shared_table: bool = False
+    explanation_budget_ms: Optional[int] = Field(default=None, ge=0, le=30000)
+
+class BatchRecommendationResult(BaseModel):
+    user_id: str
+    restaurant_id: str
+    bundles: List[MealBundle]
+
+class SearchRequest(BaseModel):
+    user_id: str  # Needed for the allergen / dietary guardrail
+    mood: Optional[str] = None  # Falls back to the user's taste profile
+    per_restaurant: int = Field(default=3, ge=1, le=10)
+    max_restaurants: int = Field(default=10, ge=1, le=50)
+
+class DishSearchHit(BaseModel):
+    dish: DishResponse
+    distance: float
+
+class RestaurantSearchResult(BaseModel):
+    restaurant_id: str
+    restaurant_name: str
+    address: Optional[str] = None
+    dishes: List[DishSearchHit]
 
 class UserOnboardingRequest(BaseModel):
     name: str
@@ -0,0 +1,382 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import Dish, Restaurant
+from backend.schemas import DishResponse
+from backend.queries import DISH_RESPONSE_COLUMNS
+from backend.bitmask import ALLERGEN_BITS, CONSTRAINT_BITS, encode_allergens, encode_constraints
+from backend.embedding_file import EMBEDDING_SNAPSHOT_PATH, EmbeddingFile, RestaurantSlice
+from backend.embeddings import provider_id, usable
+
+EMBEDDING_DIM = 768
+
+# Snapshot Config
+SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv("SNAPSHOT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# How long a snapshot is trusted before menu_version is re-checked (0 = check every request)
+SNAPSHOT_VERSION_CHECK_SECONDS = float(os.getenv("SNAPSHOT_VERSION_CHECK_SECONDS", "5"))
+# Rough per-dish cost of the DishResponse payload, for the memory bound
+_PAYLOAD_BYTES_ESTIMATE = 1024
+
+class MenuSnapshot:
+    """
+    Process-local, read-only copy of one restaurant's menu laid out for NumPy:
+      - embeddings: contiguous float32 (n, 768) matrix (+ squared row norms)
+      - price / spice / availability as compact arrays
+      - allergen / dietary-tag bitmasks (backend.bitmask), so safety checks are one
+        vectorized bitwise op; labels without a bit get a boolean column instead
+      - the DishResponse payloads, returned as-is
+    """
+    def __init__(self, restaurant_id: str, version: int, rows: Sequence,
+                 embeddings: Optional[np.ndarray] = None, has_embedding: Optional[np.ndarray] = None):
+        self.restaurant_id = restaurant_id
+        self.version = version
+        self.checked_at = time.monotonic()
+
+        n = len(rows)
+        # Vectors from a mapped embedding file (aligned with rows) are used in place: a float32
+        # mapping is shared by every worker and not counted against this process's budget
+        self.shared_embeddings = embeddings is not None and embeddings.dtype == np.float32
+        if embeddings is not None:
+            self.embeddings = np.asarray(embeddings, dtype=np.float32)
+            self.has_embedding = np.asarray(has_embedding, dtype=bool)
+        else:
+            self.embeddings = np.zeros((n, EMBEDDING_DIM), dtype=np.float32)
+            self.has_embedding = np.zeros(n, dtype=bool)
+        self.prices = np.empty(n, dtype=np.float32)
+        self.spice = np.empty(n, dtype=np.int8)
+        # NULL availability counts as available (same rule as backend.queries)
+        self.available = np.empty(n, dtype=bool)
+        # NULL allergens = unknown: blocked for anyone with an allergen (same rule as backend.queries)
+        self.allergens_known = np.empty(n, dtype=bool)
+        self.allergen_masks = np.empty(n, dtype=np.int64)
+        self.tag_masks = np.empty(n, dtype=np.int64)
+        allergen_rows: Dict[str, List[int]] = {}
+        tag_rows: Dict[str, List[int]] = {}
+        self.payloads: List[DishResponse] = []
+
+        for i, row in enumerate(rows):
+            # Another provider's vector isn't comparable: treated like a missing one
+            if embeddings is None and usable(row.embedding, row.embedding_provider) is not None:
+                self.embeddings[i] = row.embedding
+                self.has_embedding[i] = True
+            self.prices[i] = row.price
+            self.spice[i] = row.spice_level or 0
+            self.available[i] = row.is_available is not False
+            self.allergens_known[i] = row.allergens is not None
+            self.allergen_masks[i] = row.allergen_mask if row.allergen_mask is not None else encode_allergens(row.allergens)
+            self.tag_masks[i] = row.tag_mask if row.tag_mask is not None else encode_constraints(row.tags)
+            for allergen in row.allergens or []:
+                if allergen not in ALLERGEN_BITS:
+                    allergen_rows.setdefault(allergen, []).append(i)
+            for tag in row.tags or []:
+                if tag not in CONSTRAINT_BITS:
+                    tag_rows.setdefault(tag, []).append(i)
+            self.payloads.append(DishResponse(
+                id=row.id,
+                restaurant_id=row.restaurant_id,
+                name=row.name,
+                description=row.description,
+                price=row.price,
+                ingredients=row.ingredients or [],
+                allergens=row.allergens,
+                tags=row.tags or [],
+                calories=row.calories,
+                spice_level=row.spice_level or 0,
+                is_available=row.is_available is not False,
+            ))
+
+        self.allergen_columns = {k: self._column(n, idx) for k, idx in allergen_rows.items()}
+        self.tag_columns = {k: self._column(n, idx) for k, idx in tag_rows.items()}
+        self.norms_sq = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+
+    @staticmethod
+    def _column(n: int, indices: List[int]) -> np.ndarray:
+        column = np.zeros(n, dtype=bool)
+        column[indices] = True
+        return column
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.has_embedding, self.prices, self.spice, self.available, self.norms_sq, self.allergens_known,
+                  self.allergen_masks, self.tag_masks,
+                  *self.allergen_columns.values(), *self.tag_columns.values()]
+        if not self.shared_embeddings:
+            arrays.append(self.embeddings)
+        return sum(a.nbytes for a in arrays) + len(self.payloads) * _PAYLOAD_BYTES_ESTIMATE
+
+    def safe_mask(self, allergens: Optional[List[str]], constraints: Optional[List[str]]) -> np.ndarray:
+        """HARD GUARDRAIL, vectorized: available, no user allergen, every user constraint tagged."""
+        mask = self.available.copy()
+        if allergens:
+            mask &= self.allergens_known
+        allergen_mask = encode_allergens(allergens)
+        if allergen_mask:
+            mask &= (self.allergen_masks & allergen_mask) == 0
+        constraint_mask = encode_constraints(constraints)
+        if constraint_mask:
+            mask &= (self.tag_masks & constraint_mask) == constraint_mask
+
+        # Free-text labels outside the enums have no bit
+        for allergen in allergens or []:
+            if allergen in ALLERGEN_BITS:
+                continue
+            column = self.allergen_columns.get(allergen)
+            if column is not None:
+                mask &= ~column
+        for constraint in constraints or []:
+            if constraint in CONSTRAINT_BITS:
+                continue
+            column = self.tag_columns.get(constraint)
+            if column is None:
+                # No dish carries this tag, so nothing satisfies the constraint
+                return np.zeros(len(self), dtype=bool)
+            mask &= column
+        return mask
+
+    def rank(self, search_vector, allergens: Optional[List[str]], constraints: Optional[List[str]],
+             limit: int, mask: Optional[np.ndarray] = None) -> List[Tuple[DishResponse, float]]:
+        """
+        Masked matrix-vector product + argpartition top-k. Returns (payload, l2 distance)
+        best first; without a search vector, safe dishes in menu order (distance = inf).
+        `mask` is a precomputed safe_mask(allergens, constraints), if the caller has one.
+        """
+        if mask is None:
+            mask = self.safe_mask(allergens, constraints)
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0 or limit <= 0:
+            return []
+
+        if search_vector is None:
+            return [(self.payloads[i], float("inf")) for i in candidates[:limit]]
+
+        query = np.asarray(search_vector, dtype=np.float32)
+        # ||e - q||^2 = ||e||^2 - 2 e.q + ||q||^2
+        distances = self.norms_sq - 2.0 * (self.embeddings @ query) + float(query @ query)
+        distances = np.sqrt(np.maximum(distances, 0.0))
+        # Dishes without an embedding sort last, like NULLs in ORDER BY ... ASC
+        distances[~self.has_embedding] = np.inf
+
+        # Top-k over safe candidates only (never partition unsafe rows in, even at inf)
+        candidate_distances = distances[candidates]
+        k = min(limit, candidates.size)
+        top = np.argpartition(candidate_distances, k - 1)[:k]
+        top = top[np.argsort(candidate_distances[top], kind="stable")]
+        return [(self.payloads[i], float(distances[i])) for i in candidates[top]]
+
+    def rank_many(self, search_vectors: Sequence, masks: np.ndarray, limit: int) -> List[List[Tuple[DishResponse, float]]]:
+        """
+        Batch twin of rank(): scores every (query, dish) pair in one matrix product.
+        search_vectors[i] may be None (that row returns safe dishes in menu order);
+        masks is a (len(search_vectors), n) boolean array from safe_mask().
+        """
+        results: List[List[Tuple[DishResponse, float]]] = [[] for _ in search_vectors]
+        if len(self) == 0 or limit <= 0:
+            return results
+
+        ranked_rows = [i for i, v in enumerate(search_vectors) if v is not None]
+        for i, vector in enumerate(search_vectors):
+            if vector is None:
+                results[i] = [(self.payloads[j], float("inf")) for j in np.flatnonzero(masks[i])[:limit]]
+        if not ranked_rows:
+            return results
+
+        queries = np.asarray([search_vectors[i] for i in ranked_rows], dtype=np.float32)
+        row_masks = masks[ranked_rows]
+        # (q, n) squared distances in one GEMM: ||e||^2 - 2 Q.E^T + ||q||^2
+        distances = self.norms_sq[None, :] - 2.0 * (queries @ self.embeddings.T) + np.einsum("ij,ij->i", queries, queries)[:, None]
+        distances = np.sqrt(np.maximum(distances, 0.0))
+        # Safe dishes without an embedding rank after embedded ones; unsafe never rank
+        distances[:, ~self.has_embedding] = np.finfo(np.float32).max
+        distances[~row_masks] = np.inf
+
+        k = min(limit, len(self))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        for row, i in enumerate(ranked_rows):
+            results[i] = [
+                (self.payloads[j], float(distances[row, j]) if self.has_embedding[j] else float("inf"))
+                for j in top[row]
+                if row_masks[row, j]
+            ]
+        return results
+
+def _menu_rows_query(restaurant_id: str, with_embedding: bool = True):
+    columns = [*DISH_RESPONSE_COLUMNS, Dish.allergen_mask, Dish.tag_mask]
+    if with_embedding:
+        columns.extend([Dish.embedding, Dish.embedding_provider])
+    return select(*columns).where(Dish.restaurant_id == restaurant_id, Dish.deleted_at.is_(None)).order_by(Dish.id)
+
+def _menu_version_query(restaurant_id: str):
+    return select(Restaurant.menu_version).where(Restaurant.id == restaurant_id)
+
+class SnapshotStore:
+    """
+    Memory-bounded LRU of MenuSnapshots keyed by restaurant id.
+    A snapshot is reused while its restaurant's menu_version is unchanged; the version is
+    re-checked at most every SNAPSHOT_VERSION_CHECK_SECONDS. Least recently used snapshots
+    are evicted once the total footprint exceeds max_bytes.
+    With an embedding file (backend.embedding_file), a (re)load takes the vectors from the
+    shared mapping when the file has the restaurant at the same menu_version, and only the
+    small columns from Postgres.
+    """
+    def __init__(self, max_bytes: int = SNAPSHOT_CACHE_MAX_BYTES,
+                 version_check_seconds: float = SNAPSHOT_VERSION_CHECK_SECONDS,
+                 embedding_file_path: Optional[str] = EMBEDDING_SNAPSHOT_PATH):
+        self.max_bytes = max_bytes
+        self.version_check_seconds = version_check_seconds
+        self._snapshots: "OrderedDict[str, MenuSnapshot]" = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.loads = 0
+        self.embedding_file_path = embedding_file_path
+        self._embedding_file: Optional[EmbeddingFile] = None
+        self._embedding_file_stat = None
+        self._embedding_file_checked_at = 0.0
+        self.warm_loads = 0
+
+    def _current_embedding_file(self) -> Optional[EmbeddingFile]:
+        """The mapped file, reopened when the exporter os.replace()s it (new inode / mtime)."""
+        if not self.embedding_file_path:
+            return None
+        now = time.monotonic()
+        if self._embedding_file is not None and now - self._embedding_file_checked_at < self.version_check_seconds:
+            return self._embedding_file
+        self._embedding_file_checked_at = now
+        try:
+            stat = os.stat(self.embedding_file_path)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if key != self._embedding_file_stat:
+                self._embedding_file = EmbeddingFile(self.embedding_file_path)
+                self._embedding_file_stat = key
+        except (OSError, ValueError) as e:
+            if self._embedding_file_stat != "missing":
+                print(f"⚠️ Embedding file unavailable ({e}); loading vectors from Postgres")
+            self._embedding_file = None
+            self._embedding_file_stat = "missing"
+        return self._embedding_file
+
+    def _warm_slice(self, restaurant_id: str, version: Optional[int]) -> Optional[RestaurantSlice]:
+        embedding_file = self._current_embedding_file()
+        if embedding_file is None or version is None or embedding_file.provider != provider_id():
+            return None
+        warm = embedding_file.restaurant(restaurant_id)
+        if warm is None or warm.version != version:
+            return None  # Menu changed since the export: stale vectors are never used
+        return warm
+
+    def _build(self, restaurant_id: str, version: Optional[int], rows: Sequence,
+               warm: Optional[RestaurantSlice]) -> Optional[MenuSnapshot]:
+        if warm is None:
+            return MenuSnapshot(restaurant_id, version, rows)
+        if len(rows) != len(warm.ids) or any(row.id.encode("utf-8") != dish_id for row, dish_id in zip(rows, warm.ids)):
+            return None  # Rows don't line up with the file: caller reloads with vectors
+        self.warm_loads += 1
+        return MenuSnapshot(restaurant_id, version, rows, embeddings=warm.embeddings, has_embedding=warm.has_embedding)
+
+    def _fresh(self, restaurant_id: str) -> Optional[MenuSnapshot]:
+        """Snapshot that is still inside its version-check window (no DB needed)."""
+        with self._lock:
+            snapshot = self._snapshots.get(restaurant_id)
+            if snapshot is None:
+                return None
+            if time.monotonic() - snapshot.checked_at < self.version_check_seconds:
+                self._snapshots.move_to_end(restaurant_id)
+                self.hits += 1
+                return snapshot
+        return None
+
+    def _validate(self, restaurant_id: str, version: Optional[int]) -> Optional[MenuSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(restaurant_id)
+            if snapshot is not None and snapshot.version == version:
+                snapshot.checked_at = time.monotonic()
+                self._snapshots.move_to_end(restaurant_id)
+                self.hits += 1
+                return snapshot
+        return None
+
+    def put(self, snapshot: MenuSnapshot):
+        with self._lock:
+            old = self._snapshots.pop(snapshot.restaurant_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._snapshots[snapshot.restaurant_id] = snapshot
+            self._bytes += snapshot.nbytes
+            self.loads += 1
+            # Evict LRU, but always keep the one we just loaded
+            while self._bytes > self.max_bytes and len(self._snapshots) > 1:
+                _, evicted = self._snapshots.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def invalidate(self, restaurant_id: Optional[str] = None):
+        with self._lock:
+            if restaurant_id is None:
+                self._snapshots.clear()
+                self._bytes = 0
+                return
+            old = self._snapshots.pop(restaurant_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+    def get(self, db: Session, restaurant_id: str) -> MenuSnapshot:
+        snapshot = self._fresh(restaurant_id)
+        if snapshot is not None:
+            return snapshot
+        version = db.execute(_menu_version_query(restaurant_id)).scalar()
+        snapshot = self._validate(restaurant_id, version)
+        if snapshot is not None:
+            return snapshot
+        warm = self._warm_slice(restaurant_id, version)
+        rows = db.execute(_menu_rows_query(restaurant_id, with_embedding=warm is None)).all()
+        snapshot = self._build(restaurant_id, version, rows, warm)
+        if snapshot is None:
+            rows = db.execute(_menu_rows_query(restaurant_id)).all()
+            snapshot = MenuSnapshot(restaurant_id, version, rows)
+        self.put(snapshot)
+        return snapshot
+
+    async def aget(self, db: AsyncSession, restaurant_id: str) -> MenuSnapshot:
+        snapshot = self._fresh(restaurant_id)
+        if snapshot is not None:
+            return snapshot
+        version = (await db.execute(_menu_version_query(restaurant_id))).scalar()
+        snapshot = self._validate(restaurant_id, version)
+        if snapshot is not None:
+            return snapshot
+        warm = self._warm_slice(restaurant_id, version)
+        rows = (await db.execute(_menu_rows_query(restaurant_id, with_embedding=warm is None))).all()
+        snapshot = self._build(restaurant_id, version, rows, warm)
+        if snapshot is None:
+            rows = (await db.execute(_menu_rows_query(restaurant_id))).all()
+            snapshot = MenuSnapshot(restaurant_id, version, rows)
+        self.put(snapshot)
+        return snapshot
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "restaurants": len(self._snapshots),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "loads": self.loads,
+            "warm_loads": self.warm_loads,
+            "embedding_file": self._embedding_file.generation[:12] if self._embedding_file else None,
+        }
+
+# Shared per-process store
+snapshot_store = SnapshotStore()
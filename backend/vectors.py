@@ -0,0 +1,225 @@
+import os
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import literal_column, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import ColumnElement
+
+# Vector Config (env driven, same as the DB settings in main.py)
+# VECTOR_DISTANCE: "l2" | "ip". Dish vectors are normalized at write time whenever this is
+#   "ip" or a compact column is kept, so inner product ranks exactly like l2 (and is cheaper).
+VECTOR_DISTANCE = os.getenv("VECTOR_DISTANCE", "l2").lower()
+# VECTOR_COMPACT: "none" | "vector" | "halfvec" | "bit"
+#   Candidate retrieval runs on dishes.embedding_compact (the first VECTOR_COMPACT_DIM dims,
+#   renormalized: text-embedding-004 is Matryoshka-trained, so a prefix is a usable embedding),
+#   and the ANN index is built on it. The top limit * VECTOR_RERANK_FACTOR candidates are then
+#   re-ranked with the full 768-dim vectors.
+#     vector  -> float32 prefix (any pgvector)
+#     halfvec -> float16 prefix, half the bytes again (pgvector >= 0.7)
+#     bit     -> sign bit per dim, hamming distance, 1/32 of the bytes (pgvector >= 0.7)
+VECTOR_COMPACT = os.getenv("VECTOR_COMPACT", "none").lower()
+VECTOR_COMPACT_DIM = int(os.getenv("VECTOR_COMPACT_DIM", "256"))
+VECTOR_RERANK_FACTOR = int(os.getenv("VECTOR_RERANK_FACTOR", "10"))
+VECTOR_BACKFILL_BATCH_ROWS = int(os.getenv("VECTOR_BACKFILL_BATCH_ROWS", "2000"))
+
+COMPACT_COLUMN = "embedding_compact"
+COMPACT_TYPES = ("vector", "halfvec", "bit")
+# Types / functions the compact column needs that older pgvector servers don't have
+_MIN_PGVECTOR = {"halfvec": (0, 7), "bit": (0, 7)}
+
+if VECTOR_DISTANCE not in ("l2", "ip"):
+    raise ValueError(f"Unknown VECTOR_DISTANCE: {VECTOR_DISTANCE}")
+if VECTOR_COMPACT not in ("none", *COMPACT_TYPES):
+    raise ValueError(f"Unknown VECTOR_COMPACT: {VECTOR_COMPACT}")
+
+def compact_enabled() -> bool:
+    return VECTOR_COMPACT != "none"
+
+def normalize_enabled() -> bool:
+    return VECTOR_DISTANCE == "ip" or compact_enabled()
+
+def pgvector_version(connection) -> Optional[Tuple[int, int]]:
+    version = connection.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+    if not version:
+        return None
+    major, minor = (int(part) for part in version.split(".")[:2])
+    return major, minor
+
+def check_pgvector(connection):
+    """Fails startup with a readable message instead of a 'type halfvec does not exist' later."""
+    required = _MIN_PGVECTOR.get(VECTOR_COMPACT)
+    if required is None:
+        return
+    version = pgvector_version(connection)
+    if version is None or version < required:
+        found = ".".join(map(str, version)) if version else "not installed"
+        raise RuntimeError(
+            f"VECTOR_COMPACT={VECTOR_COMPACT} needs pgvector >= {required[0]}.{required[1]} (server: {found}). "
+            f"Upgrade the extension or use VECTOR_COMPACT=vector."
+        )
+
+def compact_sql_type() -> str:
+    return f"{VECTOR_COMPACT}({VECTOR_COMPACT_DIM})"
+
+def compact_ops() -> str:
+    """Operator class of the compact ANN index (must match compact_distance below)."""
+    if VECTOR_COMPACT == "bit":
+        return "bit_hamming_ops"
+    return f"{VECTOR_COMPACT}_{VECTOR_DISTANCE}_ops"
+
+def full_ops() -> str:
+    return f"vector_{VECTOR_DISTANCE}_ops"
+
+def rerank_candidates(limit: int) -> int:
+    """How many compact-distance candidates feed the full-precision re-rank of `limit` rows."""
+    return limit * VECTOR_RERANK_FACTOR if compact_enabled() else limit
+
+def distance(column, vector: Sequence[float]) -> ColumnElement:
+    """Full-precision distance for ORDER BY (lower is nearer for both operators)."""
+    if VECTOR_DISTANCE == "ip":
+        return column.max_inner_product(vector)
+    return column.l2_distance(vector)
+
+def normalize(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
+
+def compact_vector(vector: Sequence[float]):
+    """Query-side twin of the trigger: prefix, renormalized (or its sign bits)."""
+    prefix = normalize(np.asarray(vector, dtype=np.float32)[:VECTOR_COMPACT_DIM])
+    if VECTOR_COMPACT == "bit":
+        return "".join("1" if value > 0 else "0" for value in prefix)
+    return prefix.tolist()
+
+def compact_distance(vector: Sequence[float]) -> ColumnElement:
+    query = compact_vector(vector)
+    if VECTOR_COMPACT == "bit":
+        column = literal_column(f"dishes.{COMPACT_COLUMN}", type_=BIT(VECTOR_COMPACT_DIM))
+        # Only 0/1 characters: inlined as a bit literal, no driver codec needed
+        return column.op("<~>")(literal_column(f"B'{query}'"))
+    sql_type = HALFVEC(VECTOR_COMPACT_DIM) if VECTOR_COMPACT == "halfvec" else Vector(VECTOR_COMPACT_DIM)
+    return distance(literal_column(f"dishes.{COMPACT_COLUMN}", type_=sql_type), query)
+
+def _compact_expression(prefix: str) -> str:
+    """SQL turning the normalized prefix (a vector) into the compact column value."""
+    if VECTOR_COMPACT == "halfvec":
+        return f"{prefix}::halfvec({VECTOR_COMPACT_DIM})"
+    if VECTOR_COMPACT == "bit":
+        return f"binary_quantize({prefix})::bit({VECTOR_COMPACT_DIM})"
+    return prefix
+
+def schema_patches() -> List[str]:
+    """
+    Idempotent DDL for backend.migrations. A BEFORE INSERT OR UPDATE OF embedding trigger
+    normalizes dishes.embedding and derives embedding_compact, so every writer (ORM, COPY,
+    upserts) stays consistent without knowing about it.
+    The compact column is derived data: it is dropped when disabled and rebuilt (with a
+    backfill) when added or when its type changes.
+    """
+    if not normalize_enabled():
+        return [
+            "DROP TRIGGER IF EXISTS dishes_sync_vectors ON dishes",
+            f"ALTER TABLE dishes DROP COLUMN IF EXISTS {COMPACT_COLUMN}",
+        ]
+
+    # Array functions only where pgvector < 0.7 has no vector equivalent (no subvector /
+    # l2_normalize): the per-element work stays in C (vector_norm, vector * vector).
+    compact_steps = ""
+    if compact_enabled():
+        compact_steps = f"""
+    prefix := ((NEW.embedding::real[])[1:{VECTOR_COMPACT_DIM}])::vector({VECTOR_COMPACT_DIM});
+    norm := vector_norm(prefix);
+    IF norm > 0 THEN
+        prefix := prefix * array_fill((1 / norm)::real, ARRAY[{VECTOR_COMPACT_DIM}])::vector;
+    END IF;
+    NEW.{COMPACT_COLUMN} := {_compact_expression('prefix')};"""
+
+    statements = [f"""
+CREATE OR REPLACE FUNCTION dishes_sync_vectors() RETURNS trigger AS $$
+DECLARE
+    norm double precision;
+    prefix vector;
+BEGIN
+    IF NEW.embedding IS NULL THEN
+        {f'NEW.{COMPACT_COLUMN} := NULL;' if compact_enabled() else ''}
+        RETURN NEW;
+    END IF;
+    norm := vector_norm(NEW.embedding);
+    IF norm > 0 AND abs(norm - 1) > 1e-6 THEN
+        NEW.embedding := NEW.embedding * array_fill((1 / norm)::real, ARRAY[vector_dims(NEW.embedding)])::vector;
+    END IF;{compact_steps}
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS dishes_sync_vectors ON dishes",
+        # OF embedding: price / availability updates don't pay for the vector math
+        "CREATE TRIGGER dishes_sync_vectors BEFORE INSERT OR UPDATE OF embedding ON dishes "
+        "FOR EACH ROW EXECUTE FUNCTION dishes_sync_vectors()",
+    ]
+
+    if compact_enabled():
+        column_exists = (
+            "SELECT 1 FROM pg_attribute WHERE attrelid = 'dishes'::regclass "
+            f"AND attname = '{COMPACT_COLUMN}' AND NOT attisdropped"
+        )
+        statements.append(f"""
+DO $$
+BEGIN
+    IF EXISTS ({column_exists} AND format_type(atttypid, atttypmod) <> '{compact_sql_type()}') THEN
+        ALTER TABLE dishes DROP COLUMN {COMPACT_COLUMN};
+    END IF;
+    IF NOT EXISTS ({column_exists}) THEN
+        ALTER TABLE dishes ADD COLUMN {COMPACT_COLUMN} {compact_sql_type()};
+        UPDATE dishes SET embedding = embedding WHERE embedding IS NOT NULL;
+    END IF;
+END $$""")
+    else:
+        statements.append(f"ALTER TABLE dishes DROP COLUMN IF EXISTS {COMPACT_COLUMN}")
+    return statements
+
+def backfill(engine: Engine, batch_rows: int = VECTOR_BACKFILL_BATCH_ROWS) -> int:
+    """
+    Re-runs the trigger over every dish with an embedding, one committed batch at a time
+    (short locks, resumable), e.g. after enabling VECTOR_DISTANCE=ip on existing data.
+    Touched restaurants get a menu_version bump: normalization may change the vectors.
+    Returns the number of rows rewritten.
+    """
+    if not normalize_enabled():
+        return 0
+    total = 0
+    after = ""
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text(
+                "UPDATE dishes SET embedding = embedding WHERE id IN ("
+                "  SELECT id FROM dishes WHERE embedding IS NOT NULL AND id > :after ORDER BY id LIMIT :batch"
+                ") RETURNING id, restaurant_id"
+            ), {"after": after, "batch": batch_rows}).all()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = ANY(:ids)"),
+                {"ids": sorted({row.restaurant_id for row in rows})},
+            )
+        total += len(rows)
+        after = max(row.id for row in rows)
+        print(f"   ... {total} dishes")
+    return total
+
+if __name__ == "__main__":
+    # Usage: python -m backend.vectors backfill
+    from backend.database import engine
+
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        started = time.perf_counter()
+        count = backfill(engine)
+        print(f"✅ {count} dish vectors normalized / compacted ({VECTOR_DISTANCE}, compact={VECTOR_COMPACT}) "
+              f"in {time.perf_counter() - started:.1f}s")
+    else:
+        print("Usage: python -m backend.vectors backfill")
+        sys.exit(1)
@@ -54,6 +54,32 @@ def check_db_connection():
         print(f"❌ Database Connection Failed. Check Docker. Error: {e}")
         return False
 
+# Importing the API must stay cheap: workers boot (and autoscale) on it.
+# Measured in a fresh interpreter, so nothing is already cached in sys.modules.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+def check_import_time(module="backend.main", budget_ms=IMPORT_BUDGET_MS):
+    print(f"\n--- Checking Import Time ({module}) ---")
+    import subprocess
+
+    script = (
+        "import time; t = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"❌ Import of {module} failed:\n{result.stderr.strip()}")
+        return False
+
+    elapsed_ms = float(result.stdout.strip().splitlines()[-1])
+    if elapsed_ms > budget_ms:
+        print(f"❌ Import took {elapsed_ms:.0f}ms, over the {budget_ms:.0f}ms budget (IMPORT_BUDGET_MS). "
+              f"Profile with: python -X importtime -c 'import {module}'")
+        return False
+    print(f"Import took {elapsed_ms:.0f}ms (budget {budget_ms:.0f}ms).")
+    return True
+
 def main():
     imports_ok = check_imports()
     # If imports fail, likely can't test DB properly if sqlalchemy/psycopg2 missing
@@ -62,8 +88,9 @@ def main():
         sys.exit(1)
         
     db_ok = check_db_connection()
+    import_time_ok = check_import_time()
     
-    if imports_ok and db_ok:
+    if imports_ok and db_ok and import_time_ok:
         print("\n✅ Environment Healthy & Database Connected!")
     else:
         sys.exit(1)
@@ -41,6 +41,38 @@ import 'models.dart';
       throw Exception('Network error: $e');
     }
   }
+  // Streaming variant: yields NDJSON events from /recommendations/stream.
+  // {"event": "bundles", "data": [...]} arrives as soon as ranking is done,
+  // then {"event": "explanation", "index": i, "explanation": "..."} per bundle, then {"event": "done"}.
+  Stream<Map<String, dynamic>> streamBundles(String userId, String restaurantId, {String? mood}) async* {
+    final url = Uri.parse('$_baseUrl/recommendations/stream');
+
+    final request = http.Request('POST', url)
+      ..headers['Content-Type'] = 'application/json'
+      ..headers['Accept'] = 'application/x-ndjson'
+      ..body = jsonEncode({
+        "user_id": userId,
+        "restaurant_id": restaurantId,
+        if (mood != null) "mood": mood,
+      });
+
+    final client = http.Client();
+    try {
+      final response = await client.send(request);
+      if (response.statusCode != 200) {
+        throw Exception('Failed to stream bundles: ${response.statusCode}');
+      }
+
+      final lines = response.stream.transform(utf8.decoder).transform(const LineSplitter());
+      await for (final line in lines) {
+        if (line.trim().isEmpty) continue;
+        yield jsonDecode(line) as Map<String, dynamic>;
+      }
+    } finally {
+      client.close();
+    }
+  }
+
   Future<String?> createUser(String name, String email, String preferences, List<String> allergens) async {
     final url = Uri.parse('$_baseUrl/users');
     
@@ -1,8 +1,7 @@
 import sys
 import os
-import time
-import uuid
-import google.generativeai as genai
+import asyncio
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Add local path to sys.path to ensure imports work
@@ -12,54 +11,50 @@ sys.path.append(os.getcwd())
 load_dotenv()
 
 from sqlalchemy.orm import Session
-from backend.main import SessionLocal, engine, Base
-from backend.models import User, Restaurant, Dish
+from backend.database import SessionLocal, engine, init_schema
+from backend.models import Base, User, Restaurant, Dish
+from backend.embeddings import batch_provider, usable
+from backend.menu_sync import stable_id, content_hash
+from backend.embedding_file import EMBEDDING_SNAPSHOT_PATH, refresh_embeddings
 
-# Configure Gemini
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
+# Embedding provider (EMBEDDING_PROVIDER). Gemini: shared batched + rate-limited client,
+# GEMINI_BASE_URL for the fake server. Local: no key needed.
+try:
+    embedder = batch_provider()
+except ValueError:
     print("❌ Error: GOOGLE_API_KEY not found in environment variables.")
     print("Please create a .env file with GOOGLE_API_KEY=your_key")
     sys.exit(1)
 
-genai.configure(api_key=api_key)
-
-def get_embedding(text: str):
-    """Generates an embedding using Google Gemini models/text-embedding-004"""
-    try:
-        # Retry logic could be added here for production
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document",
-        )
-        return result['embedding']
-    except Exception as e:
-        print(f"Error generating embedding for '{text}': {e}")
-        # Fallback for dev if API fails? Better to fail hard so we know.
-        raise e
-
-def seed_data():
-    print("--- Seeding Database with Gemini Embeddings ---")
+def seed_data(sync: bool = False):
+    """
+    Full mode drops and recreates every table. Sync mode (--sync) keeps the data and only
+    re-embeds dishes whose embedding text changed (ids are deterministic, so rows line up).
+    """
+    print(f"--- Seeding Database with {embedder.id} Embeddings ---")
     
-    # 1. Reset Database
-    print("Dropping and creating tables...")
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    # 1. Reset Database. init_schema, not create_all: the vector extension, mask / profile /
+    # normalize triggers, compact column and ANN indexes must exist before rows go in
+    if sync:
+        print("Incremental sync: keeping existing tables...")
+    else:
+        print("Dropping and creating tables...")
+        Base.metadata.drop_all(bind=engine)
+    init_schema(engine)
     
     db = SessionLocal()
     
     try:
         # 2. Create Restaurant
         print("Creating Restaurant 'Bistro 42'...")
-        restaurant_id = str(uuid.uuid4())
+        restaurant_id = stable_id("restaurant", "Bistro 42")
         bistro = Restaurant(
             id=restaurant_id,
             name="Bistro 42",
             address="42 Food Lane",
             owner_id="admin_chef"
         )
-        db.add(bistro)
+        db.merge(bistro)
         
         # 3. Create Menu (10 Dishes)
         print("Creating Menu & Generating Embeddings (this may take a moment)...")
@@ -76,14 +71,34 @@ def seed_data():
             {"name": "Pasta Primavera", "price": 16.00, "allergens": ["gluten"], "tags": ["vegan", "vegetarian", "italian"], "desc": "Pasta with fresh seasonal vegetables"}
         ]
         
-        for d in dishes_data:
-            # Create a rich text representation for the embedding
-            # Combining Name, Tags, and Description for better semantic matching
-            embedding_text = f"{d['name']}: {d['desc']}. Tags: {', '.join(d['tags'])}"
-            print(f"  Embedding: {d['name']}...")
-            
+        # Create a rich text representation for the embedding
+        # Combining Name, Tags, and Description for better semantic matching
+        embedding_texts = [f"{d['name']}: {d['desc']}. Tags: {', '.join(d['tags'])}" for d in dishes_data]
+
+        dish_ids = [stable_id(restaurant_id, d["name"]) for d in dishes_data]
+        hashes = [content_hash(text) for text in embedding_texts]
+
+        # User preference text: "I love spicy food and asian flavors"
+        user_email = "safety_test@curate.com"
+        user_id = stable_id("user", user_email)
+        user_pref_text = "I love spicy food, asian flavors, and comfort meals."
+
+        # Sync: only texts whose hash changed (or that have no vector yet) go to Gemini
+        existing = dict(db.query(Dish.id, Dish.content_hash).filter(Dish.restaurant_id == restaurant_id).all()) if sync else {}
+        changed = [i for i, (dish_id, digest) in enumerate(zip(dish_ids, hashes)) if existing.get(dish_id) != digest]
+        existing_user = db.get(User, user_id) if sync else None
+        embed_user = existing_user is None or usable(existing_user.taste_embedding, existing_user.embedding_provider) is None
+        texts = [embedding_texts[i] for i in changed] + ([user_pref_text] if embed_user else [])
+        print(f"Embedding {len(texts)} text(s), {len(dishes_data) - len(changed)} dish(es) unchanged...")
+
+        # Everything that changed in one batched call
+        vectors = embedder.embed_many(texts, "RETRIEVAL_DOCUMENT")
+        dish_vectors = dict(zip(changed, vectors))
+        user_vector = vectors[-1] if embed_user else existing_user.taste_embedding
+
+        for i, (d, dish_id, digest) in enumerate(zip(dishes_data, dish_ids, hashes)):
             dish = Dish(
-                id=str(uuid.uuid4()),
+                id=dish_id,
                 restaurant_id=restaurant_id,
                 name=d["name"],
                 description=d["desc"],
@@ -94,36 +109,52 @@ def seed_data():
                 calories=500,
                 spice_level=1,
                 is_available=True,
-                # CALL GEMINI API
-                embedding=get_embedding(embedding_text) 
+                content_hash=digest,
+                deleted_at=None
+            )
+            if i in dish_vectors:
+                # Unchanged dishes keep their stored vector
+                dish.embedding = dish_vectors[i]
+                dish.embedding_provider = embedder.id
+                dish.embedding_dim = embedder.dim
+            db.merge(dish)
+
+        # Dishes no longer in the menu are soft-deleted (bulk UPDATE skips the flush hook: bump by hand)
+        removed = db.query(Dish).filter(
+            Dish.restaurant_id == restaurant_id,
+            Dish.deleted_at.is_(None),
+            Dish.id.notin_(dish_ids),
+        ).update({Dish.deleted_at: datetime.utcnow()}, synchronize_session=False)
+        if removed:
+            db.query(Restaurant).filter(Restaurant.id == restaurant_id).update(
+                {Restaurant.menu_version: Restaurant.menu_version + 1}, synchronize_session=False
             )
-            db.add(dish)
-            time.sleep(0.5) # Rate limiting politeness
+            print(f"Soft-deleted {removed} dish(es) no longer on the menu")
             
         # 4. Create User
         print("Creating User 'Safety Test' with Semantic Preferences...")
-        user_id = str(uuid.uuid4())
-        
-        # User preference text: "I love spicy food and asian flavors"
-        user_pref_text = "I love spicy food, asian flavors, and comfort meals."
-        
         user = User(
             id=user_id,
-            email="safety_test@curate.com",
+            email=user_email,
             hashed_password="hashed_secret",
             constraints=[],
             allergens_strict=["peanuts"],
             spice_tolerance=3,
             budget_setting=2,
-            # CALL GEMINI API
-            taste_embedding=get_embedding(user_pref_text)
+            taste_embedding=user_vector,
+            embedding_provider=embedder.id,
+            embedding_dim=embedder.dim,
         )
-        db.add(user)
+        db.merge(user)
         
         db.commit()
         print("✅ Seeding Complete with Real Embeddings!")
         print(f"User ID: {user_id}")
         print(f"Restaurant ID: {restaurant_id}")
+
+        # 5. Regenerate the shared embedding file the API workers mmap (if configured)
+        if EMBEDDING_SNAPSHOT_PATH and refresh_embeddings(engine, EMBEDDING_SNAPSHOT_PATH):
+            print(f"✅ Embedding file rewritten: {EMBEDDING_SNAPSHOT_PATH}")
         
     except Exception as e:
         print(f"❌ Error during seeding: {e}")
@@ -132,4 +163,5 @@ def seed_data():
         db.close()
 
 if __name__ == "__main__":
-    seed_data()
+    # Usage: python seed_db.py [--sync]
+    seed_data(sync="--sync" in sys.argv)
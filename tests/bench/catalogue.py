@@ -0,0 +1,169 @@
+"""
+Synthetic catalogue for the benchmarks: restaurants x dishes with a configurable allergen /
+dietary-tag mix, plus bench users, bulk-loaded with COPY (backend.bulk). Vectors are seeded
+random unit vectors labelled with the active embedding provider, so every ranking path
+(SQL, snapshot, embedding file) ranks them. No Gemini calls.
+
+    python tests/bench/catalogue.py --restaurants 200 --dishes 50 --users 500
+
+Bench rows are recognisable (restaurant ids 'bench-*', emails 'bench-*@example.com') and
+replaced on every run; the rest of the database is left alone.
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Dict, Iterator, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from psycopg2.extras import execute_values
+
+from backend.database import engine, init_schema
+from backend.bulk import bulk_load_dishes
+from backend.embeddings import EMBEDDING_DIM, provider_id
+
+# Share of dishes carrying each allergen / tag (independent draws)
+DEFAULT_ALLERGEN_MIX = "gluten=0.35,dairy=0.3,eggs=0.15,soy=0.1,peanuts=0.08,tree_nuts=0.06,fish=0.08,shellfish=0.05"
+DEFAULT_TAG_MIX = "vegetarian=0.3,vegan=0.12,gluten_free=0.2,halal=0.25,keto=0.05"
+
+BENCH_OWNER = "bench-owner"
+BENCH_EMAIL_PATTERN = "bench-%@example.com"
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'peanuts=0.1,dairy=0.3' -> {'peanuts': 0.1, 'dairy': 0.3}"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, share = item.partition("=")
+        mix[name.strip()] = float(share)
+    return mix
+
+def _draw_labels(rng: np.random.Generator, mix: Dict[str, float], count: int) -> List[List[str]]:
+    names = list(mix)
+    if not names:
+        return [[] for _ in range(count)]
+    hits = rng.random((count, len(names))) < np.array([mix[name] for name in names])
+    return [[names[j] for j in np.flatnonzero(row)] for row in hits]
+
+def _unit_vectors(rng: np.random.Generator, count: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def restaurant_ids(restaurants: int) -> List[str]:
+    return [f"bench-{i:06d}" for i in range(restaurants)]
+
+def dish_rows(rng: np.random.Generator, restaurants: int, dishes: int,
+              allergen_mix: Dict[str, float], tag_mix: Dict[str, float]) -> Iterator[Dict]:
+    """One restaurant at a time, so memory stays flat at any catalogue size."""
+    provider = provider_id()
+    for rid in restaurant_ids(restaurants):
+        vectors = _unit_vectors(rng, dishes)
+        allergens = _draw_labels(rng, allergen_mix, dishes)
+        tags = _draw_labels(rng, tag_mix, dishes)
+        prices = np.round(rng.uniform(4, 40, dishes), 2)
+        spice = rng.integers(0, 6, dishes)
+        available = rng.random(dishes) > 0.05
+        for j in range(dishes):
+            yield {
+                "id": f"{rid}-{j:05d}",
+                "restaurant_id": rid,
+                "name": f"Dish {j} of {rid}",
+                "description": "Synthetic benchmark dish",
+                "price": float(prices[j]),
+                "ingredients": [],
+                "allergens": allergens[j],
+                "tags": tags[j],
+                "calories": 500,
+                "spice_level": int(spice[j]),
+                "is_available": bool(available[j]),
+                "embedding": vectors[j],
+                "embedding_provider": provider,
+                "embedding_dim": EMBEDDING_DIM,
+            }
+
+def generate(restaurants: int = 50, dishes: int = 40, users: int = 200,
+             allergen_mix: str = DEFAULT_ALLERGEN_MIX, tag_mix: str = DEFAULT_TAG_MIX,
+             user_allergen_rate: float = 0.1, user_constraint_rate: float = 0.03, seed: int = 7) -> Dict:
+    """Replaces the bench catalogue. Returns a summary (what the load driver and the report need)."""
+    rng = np.random.default_rng(seed)
+    allergens = parse_mix(allergen_mix)
+    tags = parse_mix(tag_mix)
+    init_schema(engine)
+
+    started = time.perf_counter()
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cur:
+            # 1. Drop the previous bench catalogue (and users the load driver onboarded)
+            cur.execute("DELETE FROM dishes WHERE restaurant_id LIKE 'bench-%'")
+            cur.execute("DELETE FROM restaurants WHERE id LIKE 'bench-%'")
+            cur.execute("DELETE FROM users WHERE email LIKE %s", (BENCH_EMAIL_PATTERN,))
+
+            # 2. Restaurants
+            execute_values(cur, "INSERT INTO restaurants (id, name, address, owner_id) VALUES %s", [
+                (rid, f"Bench Restaurant {i}", "1 Benchmark Way", BENCH_OWNER)
+                for i, rid in enumerate(restaurant_ids(restaurants))
+            ])
+
+            # 3. Users: allergies / constraints drawn at the user rates, random taste vectors
+            vectors = _unit_vectors(rng, users)
+            user_allergens = _draw_labels(rng, {name: user_allergen_rate for name in allergens}, users)
+            user_constraints = _draw_labels(rng, {name: user_constraint_rate for name in tags}, users)
+            provider = provider_id()
+            execute_values(cur, (
+                "INSERT INTO users (id, name, email, hashed_password, allergens_strict, constraints, "
+                "spice_tolerance, budget_setting, taste_embedding, embedding_provider, embedding_dim) VALUES %s"
+            ), [
+                (f"bench-user-{i:06d}", f"Bench User {i}", f"bench-{i:06d}@example.com", "bench",
+                 user_allergens[i], user_constraints[i], 3, 2,
+                 "[" + ",".join(f"{v:.6f}" for v in vectors[i]) + "]", provider, EMBEDDING_DIM)
+                for i in range(users)
+            ], template="(%s, %s, %s, %s, %s::varchar[], %s::varchar[], %s, %s, %s::vector, %s, %s)")
+
+        # 4. Dishes: COPY + one index rebuild
+        loaded = bulk_load_dishes(connection, dish_rows(rng, restaurants, dishes, allergens, tags))
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return {
+        "restaurants": restaurants,
+        "dishes_per_restaurant": dishes,
+        "dishes": loaded,
+        "users": users,
+        "allergen_mix": allergens,
+        "tag_mix": tags,
+        "user_allergen_rate": user_allergen_rate,
+        "user_constraint_rate": user_constraint_rate,
+        "seed": seed,
+        "embedding_provider": provider_id(),
+        "load_seconds": round(time.perf_counter() - started, 2),
+    }
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--restaurants", type=int, default=50)
+    parser.add_argument("--dishes", type=int, default=40, help="Dishes per restaurant")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--allergen-mix", default=DEFAULT_ALLERGEN_MIX, help="allergen=share of dishes, comma separated")
+    parser.add_argument("--tag-mix", default=DEFAULT_TAG_MIX, help="dietary tag=share of dishes, comma separated")
+    parser.add_argument("--user-allergen-rate", type=float, default=0.1, help="Chance a user avoids each allergen")
+    parser.add_argument("--user-constraint-rate", type=float, default=0.03, help="Chance a user requires each tag")
+    parser.add_argument("--seed", type=int, default=7)
+
+def generate_from_args(args) -> Dict:
+    return generate(args.restaurants, args.dishes, args.users, args.allergen_mix, args.tag_mix,
+                    args.user_allergen_rate, args.user_constraint_rate, args.seed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the synthetic benchmark catalogue")
+    add_arguments(parser)
+    summary = generate_from_args(parser.parse_args())
+    print(f"✅ {summary['dishes']} dishes in {summary['restaurants']} restaurants, "
+          f"{summary['users']} users in {summary['load_seconds']}s")
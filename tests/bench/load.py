@@ -0,0 +1,157 @@
+"""
+Concurrent closed-loop load driver for a running API (see tests/bench/run.py, which starts
+one for you). Each of --concurrency workers sends its next request as soon as the previous
+one completes, until --requests are done or --duration seconds have passed.
+
+    python tests/bench/load.py --base-url http://127.0.0.1:8000 --scenario recommendations \\
+        --concurrency 16 --requests 2000
+
+Scenarios (bench users / restaurants from tests/bench/catalogue.py):
+    recommendations  POST /api/v1/recommendations, a mood on --mood-rate of the requests
+    search           POST /api/v1/search, same mood mix
+    users            POST /api/v1/users (onboarding: one embedding + one insert per request)
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from report import Sample, summarize, print_summary
+
+SCENARIOS = ("recommendations", "search", "users")
+# A small mood vocabulary: like production, most moods repeat (embedding cache hits)
+MOODS = [
+    "spicy comfort food", "something light and fresh", "cheesy and indulgent", "healthy high protein",
+    "warm soup on a rainy day", "sweet treat", "street food", "crispy fried snacks",
+]
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """'user_fetch;dur=1.2, total;dur=3.4' -> {'user_fetch': 1.2, 'total': 3.4} (ms)"""
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, *params = entry.split(";")
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                stages[name.strip()] = float(value)
+    return stages
+
+def bench_ids(limit: int = 10000):
+    """Bench user / restaurant ids straight from Postgres (the driver never guesses)."""
+    from sqlalchemy import text
+    from backend.database import engine
+
+    with engine.connect() as connection:
+        users = connection.execute(text(
+            "SELECT id FROM users WHERE email LIKE 'bench-%@example.com' AND id LIKE 'bench-user-%' ORDER BY id LIMIT :n"
+        ), {"n": limit}).scalars().all()
+        restaurants = connection.execute(text(
+            "SELECT id FROM restaurants WHERE id LIKE 'bench-%' ORDER BY id LIMIT :n"
+        ), {"n": limit}).scalars().all()
+    if not users or not restaurants:
+        raise SystemExit("No bench catalogue found: run tests/bench/catalogue.py first")
+    return users, restaurants
+
+def _request(scenario: str, rng: random.Random, users: List[str], restaurants: List[str],
+             mood_rate: float, explanation_budget_ms: Optional[int]):
+    mood = rng.choice(MOODS) if rng.random() < mood_rate else None
+    if scenario == "recommendations":
+        body = {"user_id": rng.choice(users), "restaurant_id": rng.choice(restaurants), "mood": mood}
+        if explanation_budget_ms is not None:
+            body["explanation_budget_ms"] = explanation_budget_ms
+        return "/api/v1/recommendations", body
+    if scenario == "search":
+        return "/api/v1/search", {"user_id": rng.choice(users), "mood": mood}
+    if scenario == "users":
+        suffix = uuid.uuid4().hex[:12]
+        return "/api/v1/users", {
+            "name": f"Bench Load {suffix}",
+            "email": f"bench-load-{suffix}@example.com",
+            "password": "bench-password",
+            "preferences": rng.choice(MOODS),
+            "allergens": rng.sample(["peanuts", "dairy", "gluten", "shellfish"], rng.randint(0, 2)),
+        }
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+async def run_load(base_url: str, scenario: str, concurrency: int = 8, requests: int = 500,
+                   duration: Optional[float] = None, warmup: int = 20, mood_rate: float = 0.5,
+                   explanation_budget_ms: Optional[int] = None, seed: int = 7,
+                   timeout: float = 30.0) -> Dict:
+    """Runs one scenario and returns its summary (see report.summarize)."""
+    users, restaurants = bench_ids()
+    rng = random.Random(seed)
+    samples: List[Sample] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(record: bool):
+            path, body = _request(scenario, rng, users, restaurants, mood_rate, explanation_budget_ms)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                await response.aread()
+                status = response.status_code
+                stages = parse_server_timing(response.headers.get("server-timing"))
+            except httpx.HTTPError as e:
+                status, stages = type(e).__name__, {}
+            if record:
+                samples.append(Sample(time.perf_counter() - started, status, stages))
+
+        # 1. Warm up (connections, snapshots, caches) outside the measurement
+        for _ in range(warmup):
+            await send(record=False)
+
+        # 2. Closed loop: `concurrency` requests in flight until the count / deadline is reached
+        issued = 0
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+
+        async def worker():
+            nonlocal issued
+            while (deadline is None and issued < requests) or (deadline is not None and time.perf_counter() < deadline):
+                issued += 1
+                await send(record=True)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_seconds = time.perf_counter() - started
+
+    summary = summarize(samples, wall_seconds)
+    summary["scenario"] = scenario
+    summary["concurrency"] = concurrency
+    return summary
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds per scenario (overrides --requests)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--mood-rate", type=float, default=0.5, help="Share of requests that carry a mood")
+    parser.add_argument("--explanation-budget-ms", type=int, default=None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load driver for the Curate API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="recommendations")
+    parser.add_argument("--out", help="Write the summary JSON here")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(
+        args.base_url, args.scenario, args.concurrency, args.requests, args.duration,
+        args.warmup, args.mood_rate, args.explanation_budget_ms,
+    ))
+    print_summary(summary)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,118 @@
+"""
+Benchmark summaries and run-to-run comparison.
+
+    python tests/bench/report.py show results/sql-20260101-120000.json
+    python tests/bench/report.py compare results/baseline.json results/candidate.json --threshold 10
+
+`compare` exits with status 1 when any latency percentile got slower, or throughput got
+lower, by more than --threshold percent, so it can gate CI.
+"""
+import sys
+import json
+import argparse
+from typing import Dict, List, NamedTuple, Sequence, Union
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+class Sample(NamedTuple):
+    seconds: float
+    status: Union[int, str]  # HTTP status, or the client exception name
+    stages: Dict[str, float]  # Server-Timing durations, ms
+
+def _percentiles(values_ms: Sequence[float]) -> Dict[str, float]:
+    if not len(values_ms):
+        return {}
+    values = np.asarray(values_ms, dtype=np.float64)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary["mean"] = round(float(values.mean()), 3)
+    summary["max"] = round(float(values.max()), 3)
+    return summary
+
+def summarize(samples: List[Sample], wall_seconds: float) -> Dict:
+    """Latency percentiles (ms) of successful requests, throughput, errors and per-stage percentiles."""
+    ok: List[Sample] = []
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if isinstance(s.status, int) and s.status < 400:
+            ok.append(s)
+        else:
+            errors[str(s.status)] = errors.get(str(s.status), 0) + 1
+
+    stage_names = list(dict.fromkeys(name for s in ok for name in s.stages))
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "latency_ms": _percentiles([s.seconds * 1000 for s in ok]),
+        "stages_ms": {
+            name: _percentiles([s.stages[name] for s in ok if name in s.stages])
+            for name in stage_names
+        },
+    }
+
+def print_summary(summary: Dict):
+    latency = summary["latency_ms"]
+    print(f"📊 {summary.get('scenario', '')}: {summary['ok']}/{summary['requests']} ok, "
+          f"{summary['throughput_rps']} req/s, errors {summary['errors'] or 'none'}")
+    if latency:
+        print("   latency ms  " + "  ".join(f"{key} {latency[key]:.1f}" for key in ("p50", "p95", "p99", "max")))
+    for name, stats in summary["stages_ms"].items():
+        print(f"   {name:<16}" + "  ".join(f"{key} {stats[key]:.1f}" for key in ("p50", "p95", "p99")))
+
+def compare(baseline: Dict, current: Dict, threshold_pct: float = 10.0) -> List[str]:
+    """Prints the per-scenario deltas. Returns the regressions beyond threshold_pct."""
+    regressions = []
+
+    def row(label: str, before: float, after: float, higher_is_worse: bool = True):
+        delta = (after - before) / before * 100 if before else 0.0
+        worse = delta > threshold_pct if higher_is_worse else delta < -threshold_pct
+        flag = "❌" if worse else "  "
+        print(f"{flag} {label:<34} {before:>10.2f} -> {after:>10.2f}  ({delta:+.1f}%)")
+        if worse:
+            regressions.append(f"{label}: {before:.2f} -> {after:.2f} ({delta:+.1f}%)")
+
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"   {name}: not in the baseline")
+            continue
+        print(f"--- {name} ({baseline.get('label')} -> {current.get('label')})")
+        row(f"{name} throughput req/s", before["throughput_rps"], after["throughput_rps"], higher_is_worse=False)
+        for key in (f"p{p}" for p in PERCENTILES):
+            if key in before["latency_ms"] and key in after["latency_ms"]:
+                row(f"{name} latency {key} ms", before["latency_ms"][key], after["latency_ms"][key])
+        for stage, stats in after["stages_ms"].items():
+            if stage in before["stages_ms"] and "p95" in stats:
+                row(f"{name} {stage} p95 ms", before["stages_ms"][stage]["p95"], stats["p95"])
+    return regressions
+
+def load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show / compare benchmark results")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show")
+    show.add_argument("path")
+    diff = sub.add_parser("compare")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=10.0, help="Percent change that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        result = load(args.path)
+        print(f"{result.get('label')} @ {result.get('git_commit')} ({result.get('created_at')})")
+        for summary in result["scenarios"].values():
+            print_summary(summary)
+    else:
+        regressions = compare(load(args.baseline), load(args.current), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold}%")
+            sys.exit(1)
+        print("✅ No regressions")
@@ -0,0 +1,170 @@
+"""
+End-to-end benchmark against a local Postgres + pgvector, with no external services:
+  1. starts the fake Gemini server (tests/fake_gemini.py) with the given latencies,
+  2. loads the synthetic catalogue (tests/bench/catalogue.py),
+  3. starts the API under uvicorn, pointed at the fake server,
+  4. runs each load scenario (tests/bench/load.py),
+  5. writes one JSON result (config, git commit, per-scenario percentiles and per-stage
+     Server-Timing percentiles) and, with --baseline, prints the comparison.
+
+    python tests/bench/run.py --label sql --restaurants 200 --dishes 50 --concurrency 16
+    python tests/bench/run.py --label snapshot --skip-catalogue \\
+        --server-env RECOMMENDATION_RANKER=snapshot --baseline tests/bench/results/sql-....json
+
+Postgres settings come from .env / the environment, like everything else.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(BENCH_DIR, "..", ".."))
+sys.path.append(REPO_ROOT)
+sys.path.append(os.path.join(REPO_ROOT, "tests"))
+sys.path.append(BENCH_DIR)
+from fake_gemini import start_fake_gemini
+import catalogue
+import load
+import report
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def start_server(port: int, env: dict, workers: int, timeout: float = 120.0) -> subprocess.Popen:
+    """uvicorn in a subprocess; returns once /health answers (the lifespan has run)."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=2).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"API server not healthy after {timeout:.0f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Curate end-to-end benchmark")
+    parser.add_argument("--label", default="bench", help="Name of this run (the result file starts with it)")
+    parser.add_argument("--scenarios", default="recommendations,users", help=f"Comma separated: {', '.join(load.SCENARIOS)}")
+    parser.add_argument("--skip-catalogue", action="store_true", help="Reuse the bench catalogue already loaded")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra API environment, e.g. RECOMMENDATION_RANKER=snapshot (repeatable)")
+    parser.add_argument("--embed-latency-ms", type=float, default=40, help="Fake Gemini embedding latency")
+    parser.add_argument("--generate-latency-ms", type=float, default=400, help="Fake Gemini generation latency")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--out", help="Result path (default: tests/bench/results/<label>-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier result to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold for --baseline, percent")
+    catalogue.add_arguments(parser)
+    load.add_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    for name in scenarios:
+        if name not in load.SCENARIOS:
+            parser.error(f"Unknown scenario: {name}")
+
+    # 1. Fake Gemini (in this process, on a daemon thread)
+    fake, fake_url = start_fake_gemini(0, embed_latency_ms=args.embed_latency_ms,
+                                       generate_latency_ms=args.generate_latency_ms, jitter_ms=args.jitter_ms)
+    print(f"🧪 Fake Gemini on {fake_url} (embed {args.embed_latency_ms}ms, generate {args.generate_latency_ms}ms, "
+          f"jitter {args.jitter_ms}ms)")
+
+    # 2. Catalogue
+    catalogue_summary = None
+    if not args.skip_catalogue:
+        catalogue_summary = catalogue.generate_from_args(args)
+        print(f"🗂️ Catalogue: {catalogue_summary['dishes']} dishes / {catalogue_summary['restaurants']} restaurants / "
+              f"{catalogue_summary['users']} users ({catalogue_summary['load_seconds']}s)")
+
+    # 3. API server
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    env = {**os.environ, "GEMINI_BASE_URL": fake_url, "GOOGLE_API_KEY": "fake-bench-key", **server_env}
+    port = _free_port()
+    server = start_server(port, env, args.workers)
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"🚀 API on {base_url} {server_env or ''}")
+
+    # 4. Scenarios
+    results = {}
+    try:
+        for name in scenarios:
+            summary = asyncio.run(load.run_load(
+                base_url, name, args.concurrency, args.requests, args.duration,
+                args.warmup, args.mood_rate, args.explanation_budget_ms, args.seed,
+            ))
+            report.print_summary(summary)
+            results[name] = summary
+        health = httpx.get(f"{base_url}/health", timeout=10).json()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        fake.shutdown()
+
+    # 5. Result file
+    created_at = datetime.now(timezone.utc)
+    result = {
+        "label": args.label,
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "config": {
+            "catalogue": catalogue_summary or "reused",
+            "server_env": server_env,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "mood_rate": args.mood_rate,
+            "explanation_budget_ms": args.explanation_budget_ms,
+            "fake_gemini": {
+                "embed_latency_ms": args.embed_latency_ms,
+                "generate_latency_ms": args.generate_latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "calls": dict(fake.calls),
+            },
+        },
+        "server": {"embedding_provider": health.get("embedding_provider"), "caches": health.get("caches")},
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.label}-{created_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results written to {out}")
+
+    if args.baseline:
+        regressions = report.compare(report.load(args.baseline), result, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold}%")
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Scripts, not test modules: run_test.py drives a running server (API_URL) and
+# test_seed.py seeds the database when run directly.
+collect_ignore = ["run_test.py", "test_seed.py"]
@@ -0,0 +1,126 @@
+"""
+Local stand-in for the Gemini REST API, so the seeders and the backend can run
+without a key or network. Point the code at it with:
+
+    python tests/fake_gemini.py --port 8089
+    GEMINI_BASE_URL=http://127.0.0.1:8089 GOOGLE_API_KEY=fake python seed_db.py
+
+Serves :batchEmbedContents / :embedContent (deterministic unit vectors per text)
+and :generateContent (JSON enrichment or a one-line explanation).
+--latency-ms and --fail-every simulate a slow / rate-limiting upstream (--fail-status 503 for
+an overloaded one); --embed-latency-ms /
+--generate-latency-ms override the latency per call type and --jitter-ms adds uniform noise
+(the benchmarks in tests/bench use these to model Gemini's real latency profile).
+"""
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 768
+# --fail-status values and the status names the real API sends with them
+FAIL_STATUSES = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM):
+    """Same text -> same vector, across runs and processes."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    values = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5
+    return [v / norm for v in values]
+
+def _content_text(content) -> str:
+    return "".join(part.get("text", "") for part in (content or {}).get("parts", []))
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # Keep seeder output readable
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        method = self.path.split("?")[0].rsplit(":", 1)[-1]
+
+        with server.lock:
+            server.calls[method] = server.calls.get(method, 0) + 1
+            total = sum(server.calls.values())
+        latency_ms = server.method_latency_ms.get(method, server.latency_ms)
+        if server.jitter_ms:
+            latency_ms += random.uniform(0, server.jitter_ms)
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        if server.fail_every and total % server.fail_every == 0:
+            status = FAIL_STATUSES.get(server.fail_status, "UNKNOWN")
+            self._send(server.fail_status, {"error": {"code": server.fail_status, "message": f"{status} (fake)", "status": status}})
+            return
+
+        if method == "batchEmbedContents":
+            texts = [_content_text(r.get("content")) for r in request.get("requests", [])]
+            self._send(200, {"embeddings": [{"values": fake_embedding(t)} for t in texts]})
+        elif method == "embedContent":
+            self._send(200, {"embedding": {"values": fake_embedding(_content_text(request.get("content")))}})
+        elif method == "generateContent":
+            prompt = "".join(_content_text(c) for c in request.get("contents", []))
+            config = request.get("generationConfig", {})
+            if config.get("responseMimeType") == "application/json":
+                text = json.dumps({"description": "A house favourite, freshly made to order.", "allergens": []})
+            else:
+                text = "A great match for what you are in the mood for."
+            self._send(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+                "usageMetadata": {"promptTokenCount": len(prompt.split()), "candidatesTokenCount": len(text.split())},
+            })
+        else:
+            self._send(404, {"error": {"code": 404, "message": f"Unknown method {method}", "status": "NOT_FOUND"}})
+
+def start_fake_gemini(port: int = 0, latency_ms: float = 0, fail_every: int = 0,
+                      embed_latency_ms: float = None, generate_latency_ms: float = None, jitter_ms: float = 0,
+                      fail_status: int = 429):
+    """Starts the server on a daemon thread. Returns (server, base_url); server.calls counts requests."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.latency_ms = latency_ms
+    server.method_latency_ms = {}
+    if embed_latency_ms is not None:
+        server.method_latency_ms.update(embedContent=embed_latency_ms, batchEmbedContents=embed_latency_ms)
+    if generate_latency_ms is not None:
+        server.method_latency_ms["generateContent"] = generate_latency_ms
+    server.jitter_ms = jitter_ms
+    server.fail_every = fail_every
+    server.fail_status = fail_status
+    server.calls = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth request with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=429, choices=sorted(FAIL_STATUSES))
+    parser.add_argument("--embed-latency-ms", type=float, default=None, help="Embedding calls (default: --latency-ms)")
+    parser.add_argument("--generate-latency-ms", type=float, default=None, help="generateContent calls (default: --latency-ms)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra uniform random latency per call")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_gemini(args.port, args.latency_ms, args.fail_every,
+                                         args.embed_latency_ms, args.generate_latency_ms, args.jitter_ms,
+                                         args.fail_status)
+    print(f"🧪 Fake Gemini listening on {base_url} (GEMINI_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
@@ -46,21 +46,9 @@ def run_tests():
         print("❌ FAIL: Server not running. Please start 'docker-compose up'")
         return
 
-    # Setup DB Connection for direct checks
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
+    # Setup DB Connection for direct checks (backend.database: no app startup work)
+    from backend.database import SessionLocal
     from backend.models import Restaurant, User
-    
-    # Re-use connection string from main.py logic (env)
-    DB_USER = os.getenv("POSTGRES_USER")
-    DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-    DB_HOST = os.getenv("POSTGRES_SERVER")
-    DB_PORT = os.getenv("POSTGRES_PORT")
-    DB_NAME = os.getenv("POSTGRES_DB")
-    
-    SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
 
     # 3. User Setup (Static or Dynamic)
     print("\n[Step 2] Setting up Test User...")
@@ -76,8 +64,9 @@ def run_tests():
         if not existing_user:
             print(f"⚠️ User {user_id} missing in DB (wiped). Re-creating profile...")
             
-            # Generate dummy embedding
-            from backend.main import get_gemini_embedding
+            # Generate the profile embedding (active EMBEDDING_PROVIDER)
+            from backend.main import get_embedding
+            from backend.embeddings import provider_id
             pref_text = test_prefs
             
             # Create User directly
@@ -90,7 +79,9 @@ def run_tests():
                 allergens_strict=[],
                 spice_tolerance=3,
                 budget_setting=2,
-                taste_embedding=get_gemini_embedding(pref_text)
+                taste_embedding=get_embedding(pref_text),
+                embedding_provider=provider_id(),
+                embedding_dim=768,
             )
             db.add(static_user)
             db.commit()
@@ -0,0 +1,66 @@
+"""
+backend.bundles.best_bundle (branch and bound) against brute force over
+itertools.combinations, on seeded random menus. Pure NumPy, no database.
+
+    python -m pytest tests/test_bundles.py
+"""
+import os
+import sys
+import itertools
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.bundles import best_bundle, scores_from_distances
+
+def brute_force(scores, prices, size, price_cap=None, spice_levels=None, spice_cap=None):
+    """Best summed score over every `size` combination that fits both caps, or None."""
+    best = None
+    for combo in itertools.combinations(range(len(scores)), size):
+        if price_cap is not None and sum(prices[i] for i in combo) > price_cap:
+            continue
+        if spice_cap is not None and any((spice_levels[i] or 0) > spice_cap for i in combo):
+            continue
+        score = sum(scores[i] for i in combo)
+        if best is None or score > best:
+            best = score
+    return best
+
+CASES = [(seed, size) for seed in range(60) for size in (1, 2, 3)]
+
+@pytest.mark.parametrize("seed,size", CASES)
+def test_matches_brute_force(seed, size):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(size, 16))
+    scores = rng.normal(size=n)
+    prices = np.round(rng.uniform(3, 40, size=n), 2)
+    spice_levels = rng.integers(0, 6, size=n).tolist()
+    price_cap = [None, 20.0, 45.0, 80.0][seed % 4]
+    spice_cap = [None, 2, 4][seed % 3]
+
+    found = best_bundle(scores, prices, size, price_cap, spice_levels, spice_cap)
+    expected = brute_force(scores, prices, size, price_cap, spice_levels, spice_cap)
+
+    if expected is None:
+        assert found is None
+        return
+    assert found is not None
+    assert found.score == pytest.approx(expected)
+    # The returned bundle itself must be valid, not just its score
+    assert len(set(found.indices)) == size
+    assert found.total_price == pytest.approx(sum(prices[i] for i in found.indices))
+    if price_cap is not None:
+        assert found.total_price <= price_cap + 1e-9
+    if spice_cap is not None:
+        assert all(spice_levels[i] <= spice_cap for i in found.indices)
+    assert found.score == pytest.approx(sum(scores[i] for i in found.indices))
+
+def test_nothing_fits():
+    assert best_bundle([1.0, 0.5], [30.0, 30.0], 2, price_cap=50.0) is None
+    assert best_bundle([1.0], [10.0], 2) is None
+
+def test_unranked_dishes_score_last():
+    scores = scores_from_distances([0.2, None, 0.5])
+    assert scores[1] < scores[2] < scores[0]
@@ -0,0 +1,90 @@
+"""
+GeminiClient against tests/fake_gemini.py (started in-process, no key or network needed):
+batching, retry on 429 / 503, the client-side rate limit, and the enrichment fallback.
+
+    python -m pytest tests/test_gemini_client.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(__file__))
+
+pytest.importorskip("google.genai")
+
+from fake_gemini import fake_embedding, start_fake_gemini
+from backend.gemini import GeminiClient
+
+@pytest.fixture
+def fake():
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_fake_gemini(0, **kwargs)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _client(base_url: str, **kwargs) -> GeminiClient:
+    options = dict(requests_per_minute=0, backoff_seconds=0.01)
+    options.update(kwargs)
+    return GeminiClient(api_key="fake", base_url=base_url, **options)
+
+def test_embeddings_are_batched_in_order(fake):
+    server, base_url = fake()
+    client = _client(base_url, batch_size=100)
+    texts = [f"dish {i}" for i in range(250)]
+
+    vectors = asyncio.run(client.embed_many(texts))
+
+    assert server.calls == {"batchEmbedContents": 3}
+    assert len(vectors) == 250
+    for text, vector in zip(texts, vectors):
+        assert vector == pytest.approx(fake_embedding(text), abs=1e-6)
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retryable_errors_are_retried(fake, status):
+    server, base_url = fake(fail_every=2, fail_status=status)
+    client = _client(base_url, batch_size=10, max_concurrency=1)
+
+    vectors = asyncio.run(client.embed_many([f"dish {i}" for i in range(40)]))
+
+    assert len(vectors) == 40
+    assert client.retries > 0
+    assert client.requests == server.calls["batchEmbedContents"] == 4 + client.retries
+
+def test_enrichment_gives_up_with_a_fallback(fake):
+    server, base_url = fake(fail_every=1)
+    client = _client(base_url, max_retries=2)
+
+    enriched = asyncio.run(client.enrich_dish("Masala Dosa", "Tiffins"))
+
+    assert enriched["fallback"] is True
+    assert enriched["allergens"] is None  # unknown, never a confirmed empty list
+    assert server.calls["generateContent"] == 3
+
+def test_enrichment_success(fake):
+    _, base_url = fake()
+    enriched = asyncio.run(_client(base_url).enrich_dish("Masala Dosa", "Tiffins"))
+    assert enriched["fallback"] is False
+    assert enriched["allergens"] == []
+
+def test_rate_limit_is_respected(fake):
+    server, base_url = fake()
+    # 600 RPM = one request per 100 ms after a burst of 1
+    client = _client(base_url, requests_per_minute=600, burst=1, max_concurrency=8)
+
+    started = time.monotonic()
+    asyncio.run(client.enrich_many([(f"dish {i}", "Mains") for i in range(6)]))
+    elapsed = time.monotonic() - started
+
+    assert server.calls["generateContent"] == 6
+    assert elapsed >= 0.45  # 5 waits of 100 ms (minus timer slack)
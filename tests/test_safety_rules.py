@@ -0,0 +1,86 @@
+"""
+Unknown allergens (NULL, e.g. a failed enrichment) must be handled the same way by every
+safety path: blocked for anyone with an allergen, served to everyone else.
+Needs the Postgres from .env; writes inside one transaction that is rolled back.
+
+    python -m pytest tests/test_safety_rules.py
+"""
+import os
+import sys
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    from sqlalchemy import text
+    from backend.database import SessionLocal
+    with SessionLocal() as probe:
+        probe.execute(text("SELECT 1"))
+except Exception as e:  # No database configured / reachable
+    pytest.skip(f"Postgres not available: {e}", allow_module_level=True)
+
+from backend.models import Dish, Restaurant
+from backend.queries import safe_dishes_query, blocked_count
+from backend.snapshot import MenuSnapshot, _menu_rows_query
+
+RESTAURANT_ID = "test-safety-rules"
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        session.add(Restaurant(id=RESTAURANT_ID, name="Safety Rules", owner_id="test"))
+        session.flush()
+        # Raw SQL like the seeders, so the mask trigger (not the ORM listener) fills the masks
+        for dish_id, allergens in (("unknown", None), ("none", []), ("peanut", ["peanuts"]), ("mystery", ["mystery"])):
+            session.execute(
+                text("INSERT INTO dishes (id, restaurant_id, name, price, allergens, tags) "
+                     "VALUES (:id, :rid, :id, 10, :allergens, '{}')"),
+                {"id": f"{RESTAURANT_ID}-{dish_id}", "rid": RESTAURANT_ID, "allergens": allergens},
+            )
+        session.flush()
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+def _sql_safe(db, allergens):
+    return {dish.id.rsplit("-", 1)[1] for dish in db.execute(safe_dishes_query(RESTAURANT_ID, allergens)).scalars()}
+
+def _snapshot_safe(db, allergens):
+    snapshot = MenuSnapshot(RESTAURANT_ID, 0, db.execute(_menu_rows_query(RESTAURANT_ID)).all())
+    mask = snapshot.safe_mask(allergens, [])
+    return {payload.id.rsplit("-", 1)[1] for payload, safe in zip(snapshot.payloads, mask) if safe}
+
+def test_unknown_allergens_keep_a_null_mask(db):
+    masks = dict(db.execute(text("SELECT id, allergen_mask FROM dishes WHERE restaurant_id = :rid"), {"rid": RESTAURANT_ID}).all())
+    assert masks[f"{RESTAURANT_ID}-unknown"] is None
+    assert masks[f"{RESTAURANT_ID}-none"] == 0
+
+def test_bitmask_path_blocks_unknown(db):
+    assert _sql_safe(db, ["dairy"]) == {"none", "peanut", "mystery"}
+    assert _sql_safe(db, ["peanuts"]) == {"none", "mystery"}
+
+def test_array_path_blocks_unknown(db):
+    # "sesame" has no bit, so the free-text array overlap is used
+    assert _sql_safe(db, ["sesame"]) == {"none", "peanut", "mystery"}
+    assert _sql_safe(db, ["mystery"]) == {"none", "peanut"}
+
+def test_snapshot_path_blocks_unknown(db):
+    assert _snapshot_safe(db, ["dairy"]) == {"none", "peanut", "mystery"}
+    assert _snapshot_safe(db, ["peanuts"]) == {"none", "mystery"}
+    assert _snapshot_safe(db, ["sesame"]) == {"none", "peanut", "mystery"}
+    assert _snapshot_safe(db, ["mystery"]) == {"none", "peanut"}
+
+@pytest.mark.parametrize("allergens", [[], ["peanuts"], ["sesame"], ["mystery", "dairy"]])
+def test_paths_agree(db, allergens):
+    assert _sql_safe(db, allergens) == _snapshot_safe(db, allergens)
+    blocked = db.scalar(db.query(blocked_count(RESTAURANT_ID, allergens)).statement)
+    assert blocked == 4 - len(_sql_safe(db, allergens))
+
+def test_no_allergens_serves_unknown(db):
+    assert "unknown" in _sql_safe(db, [])
+    assert "unknown" in _snapshot_safe(db, [])
@@ -1,22 +1,23 @@
 import os
+import sys
 import json
-import time
-import uuid
+import asyncio
 import psycopg2
-from google import genai
-from google.genai import types
 from dotenv import load_dotenv
 
 # 1. Load the .env file automatically
 load_dotenv() 
 
-# Load API Key
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY is not set in .env file")
-
-# Initialize the Client
-client = genai.Client(api_key=GOOGLE_API_KEY)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backend.gemini import GeminiClient, enrichment_fallback
+from backend.embeddings import batch_provider
+from backend.bulk import bulk_load_dishes
+from backend.database import engine
+from backend.embedding_file import EMBEDDING_SNAPSHOT_PATH, refresh_embeddings
+from backend.menu_sync import (
+    stable_id, content_hash, existing_content_hashes, upsert_dishes, update_prices,
+    soft_delete_missing, bump_menu_versions,
+)
 
 # 2. DB Config
 DB_NAME = os.getenv("POSTGRES_DB")
@@ -34,64 +35,48 @@ def get_db_connection():
         port=DB_PORT
     )
 
-def get_embedding(text):
-    """Generates a 768-dim vector using the new SDK."""
-    try:
-        response = client.models.embed_content(
-            model="text-embedding-004",
-            contents=text
-        )
-        return response.embeddings[0].values
-    except Exception as e:
-        print(f"Error embedding text: {e}")
-        return [0.0] * 768
-
-def enrich_dish(item_name, grouping):
-    """Uses Gemini to generate description and allergens."""
-    prompt = f"""
-    Describe the dish '{item_name}' (Category: {grouping}). 
-    Provide a 1-sentence description and a list of common allergens.
-    Return ONLY valid JSON with this format:
-    {{
-        "description": "...",
-        "allergens": ["..."]
-    }}
+def seed_test_data(sync: bool = False):
     """
+    Full mode: wipe and bulk load every menu.
+    Sync mode (--sync): keep existing rows; only dishes whose content hash changed are
+    re-enriched / re-embedded, price-only changes are patched, missing dishes are soft-deleted.
+    """
+    # 0. Clients, built here rather than at import. Shared batched + rate-limited Gemini client
+    # (GEMINI_BASE_URL to run against tests/fake_gemini.py); without GOOGLE_API_KEY dishes are
+    # stored unenriched and retried by the next --sync. Embeddings from EMBEDDING_PROVIDER
+    # (Gemini through the same client by default, which does need the key).
     try:
-        # Using the latest available flash model
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
-            )
-        )
-        return json.loads(response.text)
-    except Exception as e:
-        print(f"Error enriching dish {item_name}: {e}")
-        return {"description": f"A delicious {item_name}", "allergens": []}
+        gemini = GeminiClient()
+    except ValueError:
+        print("⚠️ GOOGLE_API_KEY not set: dishes are stored unenriched (unknown allergens)")
+        gemini = None
+    embedder = batch_provider(gemini)
 
-def seed_test_data():
     conn = get_db_connection()
     cur = conn.cursor()
 
-    print("--- Dynamic Test Seeding ---")
+    print(f"--- Dynamic Test Seeding ({'incremental sync' if sync else 'full reset'}) ---")
     
     # 1. Wipe Tables
-    print("Resetting Tables...")
-    cur.execute("TRUNCATE TABLE dishes, restaurants, users CASCADE;")
+    if not sync:
+        print("Resetting Tables...")
+        cur.execute("TRUNCATE TABLE dishes, restaurants, users CASCADE;")
     
-    # 2. CREATE DUMMY OWNER
-    owner_id = str(uuid.uuid4())
-    print(f"Creating Test Owner ({owner_id})...")
+    # 2. CREATE DUMMY OWNER (stable id, so re-seeding finds the same one)
+    owner_email = "restaurant_owner@test.com"
     cur.execute(
-        "INSERT INTO users (id, email, hashed_password) VALUES (%s, %s, %s)",
-        (owner_id, "restaurant_owner@test.com", "dummy_hash")
+        "INSERT INTO users (id, email, hashed_password) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+        (stable_id("user", owner_email), owner_email, "dummy_hash")
     )
+    cur.execute("SELECT id FROM users WHERE email = %s", (owner_email,))
+    owner_id = cur.fetchone()[0]
+    print(f"Test Owner: {owner_id}")
+
+    dish_rows = []
 
     # 3. Find JSON Files
     data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    for filename in os.listdir(data_dir):
+    for filename in sorted(os.listdir(data_dir)):
         if filename.endswith(".json"):
             name_part = filename.replace(".json", "")
             if "-" in name_part:
@@ -104,56 +89,91 @@ def seed_test_data():
 
             # 4. Create Restaurant
             cur.execute(
-                "INSERT INTO restaurants (id, name, address, owner_id) VALUES (%s, %s, %s, %s) ON CONFLICT (id) DO NOTHING",
+                "INSERT INTO restaurants (id, name, address, owner_id) VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name",
                 (r_id, r_name, "123 Test St", owner_id)
             )
 
-            # 5. Load Dishes
+            # 5. Load Dishes (deterministic id + hash of the enrichment inputs per item)
             with open(os.path.join(data_dir, filename), 'r') as f:
                 data = json.load(f)
                 
-            menu_items = data.get("menu", [])
-            for group in menu_items:
+            items = []
+            seen = {}
+            for group in data.get("menu", []):
                 group_name = group.get("grouping")
-                print(f"  Group: {group_name}")
-                
                 for item in group.get("items", []):
-                    d_name = item["item"]
-                    d_price = item["price"]
-                    dish_id = str(uuid.uuid4()) 
-                    
-                    print(f"    Enriching: {d_name}...", end="", flush=True)
-                    
-                    enriched = enrich_dish(d_name, group_name)
-                    vector_text = f"{d_name} {enriched['description']} {group_name}"
-                    vector = get_embedding(vector_text)
-                    
-                    cur.execute(
-                        """
-                        INSERT INTO dishes 
-                        (id, name, description, price, restaurant_id, spice_level, allergens, embedding, ingredients, tags, is_available)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            dish_id, 
-                            d_name, 
-                            enriched['description'], 
-                            d_price, 
-                            r_id, 
-                            2,
-                            enriched['allergens'],
-                            vector,
-                            [], # ingredients default
-                            [], # tags default
-                            True # is_available default
-                        )
-                    )
-                    print("Done.")
-                    time.sleep(0.5)
+                    key = (group_name, item["item"])
+                    seen[key] = seen.get(key, 0) + 1  # Same name twice in a group -> distinct ids
+                    dish_id = stable_id(r_id, group_name, item["item"], str(seen[key]))
+                    items.append((dish_id, item["item"], item["price"], group_name, content_hash(item["item"], group_name)))
+
+            existing = existing_content_hashes(cur, r_id) if sync else {}
+            changed = [it for it in items if existing.get(it[0]) != it[4]]
+            unchanged = [it for it in items if existing.get(it[0]) == it[4]]
+
+            # 6. Enrich concurrently, then embed in batched requests: changed dishes only
+            print(f"  {len(changed)} to enrich & embed, {len(unchanged)} unchanged")
+            if gemini is not None:
+                enriched_items = asyncio.run(gemini.enrich_many([(name, group_name) for _, name, _, group_name, _ in changed]))
+            else:
+                enriched_items = [enrichment_fallback(name) for _, name, _, _, _ in changed]
+            failed = sum(enriched["fallback"] for enriched in enriched_items)
+            if failed:
+                print(f"  ⚠️ {failed} dishes not enriched: stored with unknown allergens, retried on the next --sync")
+            vectors = asyncio.run(embedder.aembed_many([
+                f"{name} {enriched['description']} {group_name}"
+                for (_, name, _, group_name, _), enriched in zip(changed, enriched_items)
+            ], "RETRIEVAL_DOCUMENT"))
+
+            rows = [
+                {
+                    "id": dish_id,
+                    "name": d_name,
+                    "description": enriched['description'],
+                    "price": d_price,
+                    "restaurant_id": r_id,
+                    "spice_level": 2,
+                    "allergens": enriched['allergens'],
+                    "embedding": vector,
+                    "embedding_provider": embedder.id,
+                    "embedding_dim": embedder.dim,
+                    "ingredients": [], # ingredients default
+                    "tags": [], # tags default
+                    "is_available": True, # is_available default
+                    # Failed enrichment: allergens unknown (NULL, blocked for allergic users) and
+                    # no content hash, so the next --sync run retries the dish
+                    "content_hash": None if enriched["fallback"] else digest,
+                }
+                for (dish_id, d_name, d_price, group_name, digest), enriched, vector in zip(changed, enriched_items, vectors)
+            ]
+
+            if sync:
+                upserted = upsert_dishes(cur, rows)
+                repriced = update_prices(cur, {dish_id: d_price for dish_id, _, d_price, _, _ in unchanged})
+                removed = soft_delete_missing(cur, r_id, [it[0] for it in items])
+                if upserted or repriced or removed:
+                    bump_menu_versions(cur, [r_id])
+                print(f"  Upserted {upserted}, repriced {repriced}, soft-deleted {removed}. {gemini.stats() if gemini else ''}")
+            else:
+                dish_rows.extend(rows)
+                print(f"  Done. {gemini.stats() if gemini else ''}")
+
+    # 7. Full mode: bulk load every menu with COPY, vector indexes rebuilt once afterwards
+    if not sync:
+        print(f"Loading {len(dish_rows)} dishes...")
+        loaded = bulk_load_dishes(conn, dish_rows)
+        print(f"Loaded {loaded} dishes.")
 
     conn.commit()
     cur.close()
     conn.close()
 
+    # 8. Regenerate the shared embedding file the API workers mmap (if configured), otherwise
+    # every worker sees a stale generation and loads vectors from Postgres
+    if EMBEDDING_SNAPSHOT_PATH and refresh_embeddings(engine, EMBEDDING_SNAPSHOT_PATH):
+        print(f"✅ Embedding file rewritten: {EMBEDDING_SNAPSHOT_PATH}")
+
 if __name__ == "__main__":
-    seed_test_data()
\ No newline at end of file
+    # Usage: python tests/test_seed.py [--sync]
+    seed_test_data(sync="--sync" in sys.argv)